@@ -1,5 +1,9 @@
-import sys
+import io
+import random
 import re
+import sys
+import time
+from array import array
 
 
 class DequeException(Exception):
@@ -7,18 +11,65 @@ class DequeException(Exception):
 
 
 class Deque:
-    def __init__(self):
+    def __init__(self, growable=False, typecode=None):
         self.deque = None
         self.size = 0
         self.capacity = 0
         self.head = 0
         self.tail = 0
 
+        self.growable = growable
+        self.typecode = typecode
+
+    def make_storage(self, n):
+        if self.typecode is None:
+            return [None] * n
+        return array(self.typecode, [0]) * n
+
+    def grow(self, required):
+        new_capacity = max(self.capacity, 1)
+        while new_capacity < required:
+            new_capacity *= 2
+
+        storage = self.make_storage(new_capacity)
+        storage[:self.size] = self.read(self.head, self.size)
+
+        self.deque = storage
+        self.capacity = new_capacity
+        self.head = 0
+        self.tail = self.size
+
+    def reserve(self, n):
+        if self.deque is None:
+            raise DequeException('error')
+        if self.size + n <= self.capacity:
+            return
+        if not self.growable:
+            raise DequeException('overflow')
+
+        self.grow(max(self.size + n, 2 * self.capacity))
+
+    def read(self, start, n):
+        end = start + n
+        if end <= self.capacity:
+            return self.deque[start:end]
+        return self.deque[start:] + self.deque[:end - self.capacity]
+
+    def write(self, start, elements):
+        first = min(len(elements), self.capacity - start)
+        self.deque[start:start + first] = elements[:first]
+        self.deque[:len(elements) - first] = elements[first:]
+
+    def as_batch(self, elements):
+        if self.typecode is None:
+            return list(elements)
+        return array(self.typecode, elements)
+
     def push_back(self, element):
         if self.deque is None:
             raise DequeException('error')
         if self.size == self.capacity:
-            raise DequeException('overflow')
+            self.reserve(1)
 
         self.deque[self.tail] = element
         self.size += 1
@@ -45,7 +96,7 @@ class Deque:
         if self.deque is None:
             raise DequeException('error')
         if self.size == self.capacity:
-            raise DequeException('overflow')
+            self.reserve(1)
         if self.head == 0:
             self.head = self.capacity
 
@@ -70,33 +121,145 @@ class Deque:
 
         return element
 
-    def print(self):
+    def extend_back(self, elements):
+        batch = self.as_batch(elements)
+        self.reserve(len(batch))
+        if not batch:
+            return
+
+        self.write(self.tail, batch)
+        self.size += len(batch)
+        self.tail = (self.tail + len(batch)) % self.capacity
+
+    def extend_front(self, elements):
+        batch = self.as_batch(elements)
+        self.reserve(len(batch))
+        if not batch:
+            return
+
+        batch.reverse()
+        self.head = (self.head - len(batch)) % self.capacity
+        self.write(self.head, batch)
+        self.size += len(batch)
+
+    def pop_many(self, n, back=False):
+        if self.deque is None or n < 0:
+            raise DequeException('error')
+        if n > self.size:
+            raise DequeException('underflow')
+        if n == 0:
+            return self.make_storage(0)
+
+        if back:
+            self.tail = (self.tail - n) % self.capacity
+            elements = self.read(self.tail, n)
+            elements.reverse()
+        else:
+            elements = self.read(self.head, n)
+            self.head = (self.head + n) % self.capacity
+
+        self.size -= n
+
+        return elements
+
+    def print(self, out=sys.stdout):
         if self.deque is None:
             raise DequeException('error')
         if self.size == 0:
-            print('empty')
+            out.write('empty\n')
             return
 
-        element_pos = self.head
-
-        for i in range(self.size):
-            print(self.deque[element_pos], end=' ') if i != (self.size - 1) else print(self.deque[element_pos])
-            element_pos += 1
-            if element_pos == self.capacity:
-                element_pos = 0
+        out.write(' '.join(map(str, self.read(self.head, self.size))))
+        out.write('\n')
 
     def set_size(self, n):
         if self.deque is not None:
             raise DequeException('error')
 
-        self.deque = [None] * n
+        self.deque = self.make_storage(n)
         self.capacity = n
 
 
-if __name__ == '__main__':
-    deque = Deque()
+BLOCK_SIZE = 1 << 20
 
-    for line in sys.stdin:
+
+def cmd_pushb(deque, arg, out):
+    deque.push_back(arg)
+
+
+def cmd_pushf(deque, arg, out):
+    deque.push_front(arg)
+
+
+def cmd_set_size(deque, arg, out):
+    if not arg.isdecimal():
+        raise DequeException('error')
+    deque.set_size(int(arg))
+
+
+def cmd_popb(deque, out):
+    out.write(f'{deque.pop_back()}\n')
+
+
+def cmd_popf(deque, out):
+    out.write(f'{deque.pop_front()}\n')
+
+
+def cmd_print(deque, out):
+    deque.print(out)
+
+
+ARG_COMMANDS = {'pushb': cmd_pushb, 'pushf': cmd_pushf, 'set_size': cmd_set_size}
+COMMANDS = {'popb': cmd_popb, 'popf': cmd_popf, 'print': cmd_print}
+
+
+def read_lines(stream, block_size=BLOCK_SIZE):
+    rest = ''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+
+        lines = (rest + block).split('\n')
+        rest = lines.pop()
+        yield lines
+
+    if rest:
+        yield [rest]
+
+
+def run(deque, stream=sys.stdin, output=sys.stdout):
+    out = io.StringIO()
+
+    for lines in read_lines(stream):
+        for line in lines:
+            name, sep, arg = line.partition(' ')
+
+            try:
+                if sep:
+                    command = ARG_COMMANDS.get(name)
+                    if command is None or arg.split() != [arg]:
+                        out.write('error\n')
+                    else:
+                        command(deque, arg, out)
+                else:
+                    command = COMMANDS.get(name)
+                    if command is not None:
+                        command(deque, out)
+                    elif line != '':
+                        out.write('error\n')
+
+            except DequeException as DE:
+                out.write(f'{DE}\n')
+
+        output.write(out.getvalue())
+        out.seek(0)
+        out.truncate()
+
+
+# Прежний драйвер: каждая строка проверяется регулярными выражениями. Оставлен для bench.
+def run_regex(deque, stream=sys.stdin, output=sys.stdout):
+    for line in stream:
         line = line.replace('\n', '')
         cmd = line.split()
 
@@ -109,16 +272,51 @@ if __name__ == '__main__':
                     deque.push_front(element)
             elif re.match(re.compile('(popb|popf)$'), line):
                 if cmd[0] == 'popb':
-                    print(deque.pop_back())
+                    print(deque.pop_back(), file=output)
                 elif cmd[0] == 'popf':
-                    print(deque.pop_front())
+                    print(deque.pop_front(), file=output)
             elif re.match(re.compile('set_size ([\\d]+)$'), line):
                 element = cmd[1]
                 deque.set_size(int(element))
             elif re.match(re.compile('(print)$'), line):
-                deque.print()
+                deque.print(output)
             elif line != "":
-                print('error')
+                print('error', file=output)
 
         except DequeException as DE:
-            print(DE)
\ No newline at end of file
+            print(DE, file=output)
+
+
+# Поток из commands случайных команд push/pop после set_size; оба драйвера читают его
+# из памяти и пишут в StringIO, так что сравнивается только разбор и выполнение команд.
+def bench(out=sys.stdout, commands=1000000, seed=1):
+    rng = random.Random(seed)
+    names = ('pushb', 'pushf', 'popb', 'popf')
+    lines = [f'set_size {commands // 4}']
+    for idx in range(commands):
+        name = rng.choice(names)
+        lines.append(f'{name} {idx}' if name.startswith('push') else name)
+    text = '\n'.join(lines) + '\n'
+
+    results = []
+    for name, driver in (('regex', run_regex), ('table', run)):
+        output = io.StringIO()
+        start = time.perf_counter()
+        driver(Deque(), io.StringIO(text), output)
+        elapsed = time.perf_counter() - start
+        results.append(output.getvalue())
+        out.write(f'{name}: {elapsed:.3f}s\n')
+
+    if results[0] != results[1]:
+        out.write('outputs differ\n')
+
+
+if __name__ == '__main__':
+    # "deque.py" - фильтр stdin -> stdout; "deque.py bench [N]" - сравнение с прежним драйвером.
+    if len(sys.argv) > 1 and sys.argv[1] == 'bench':
+        if len(sys.argv) > 3 or len(sys.argv) == 3 and not sys.argv[2].isdecimal():
+            sys.exit('usage: deque.py [bench [N]]')
+        bench(commands=int(sys.argv[2]) if len(sys.argv) == 3 else 1000000)
+        sys.exit()
+
+    run(Deque())
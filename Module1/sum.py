@@ -1,24 +1,93 @@
+import mmap
+import multiprocessing
+import os
+import re
 import sys
 
+CHUNK_SIZE = 1 << 22
+FILE_CHUNK_SIZE = 1 << 24
+DIGITS = b'0123456789'
+MINUS = ord('-')
+NUMBER = re.compile(rb'-?[0-9]+')
 
-def calc_sum() -> int:
+
+# Скорость ограничена самим re и int(): около 25-30 МБ/с на поток (на 89 МБ findall ~1.75 с,
+# int и sum ~1.25 с), до сотен МБ/с такой разбор не дотягивает.
+def chunk_sum(data, start=0, end=sys.maxsize) -> int:
+    return sum(map(int, NUMBER.findall(data, start, end)))
+
+
+def number_tail(data, end) -> int:
+    # Начало числа (вместе с минусом перед ним), которым заканчивается data[:end].
+    cut = end
+    while cut and data[cut - 1] in DIGITS:
+        cut -= 1
+    if cut and data[cut - 1] == MINUS:
+        cut -= 1
+
+    return cut
+
+
+def range_sum(path, start, end, limit) -> int:
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # Число, начавшееся в предыдущем диапазоне, считает его обработчик.
+        if start and data[start] in DIGITS and (data[start - 1] in DIGITS or data[start - 1] == MINUS):
+            while start < limit and data[start] in DIGITS:
+                start += 1
+            if start >= end:
+                return 0
+
+        # Число, начавшееся в этом диапазоне, дочитываем до конца.
+        while end < limit and data[end] in DIGITS and (data[end - 1] in DIGITS or data[end - 1] == MINUS):
+            end += 1
+
+        return chunk_sum(data, start, end)
+
+
+def calc_file_sum(path, chunk_size=FILE_CHUNK_SIZE, processes=None) -> int:
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return 0
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Как и в calc_sum, число в самом конце файла не учитывается.
+            limit = number_tail(data, len(data))
+
+    ranges = [(path, start, min(start + chunk_size, limit), limit) for start in range(0, limit, chunk_size)]
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(ranges))
+
+    if processes <= 1:
+        return sum(range_sum(*args) for args in ranges)
+
+    with multiprocessing.Pool(processes) as pool:
+        return sum(pool.starmap(range_sum, ranges))
+
+
+def calc_sum(source=None, chunk_size=CHUNK_SIZE, processes=None) -> int:
+    if isinstance(source, (str, os.PathLike)):
+        return calc_file_sum(source, processes=processes)
+
+    stream = sys.stdin.buffer if source is None else source
     summ = 0
-    next_num = 0
-    sign = 1
-    for symbol in sys.stdin.read():
-        if symbol == '-':
-            summ += sign * next_num
-            sign = -1
-            next_num = 0
-        elif symbol.isdigit():
-            next_num = next_num * 10 + ord(symbol) - 48
-        else:
-            summ += sign * next_num
-            next_num = 0
-            sign = 1
+    rest = b''
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+
+        chunk = rest + chunk if rest else chunk
+
+        # Число (вместе с минусом перед ним) на конце блока может продолжиться в следующем.
+        cut = number_tail(chunk, len(chunk))
+        summ += chunk_sum(chunk, 0, cut)
+        rest = chunk[cut:]
 
+    # Как и раньше, число в самом конце ввода без завершающего символа не учитывается.
     return summ
 
 
 if __name__ == '__main__':
-    print(calc_sum())
\ No newline at end of file
+    print(calc_sum(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -1,85 +1,571 @@
+import heapq
+import struct
 import sys
+from array import array
+from collections import deque
 
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
 
-class Lib:
-    def __init__(self, name):
-        self.lib_name = name
-        self.is_visited = False
 
-        self.dependencies = set()
-        self.parents = set()
+def make_csr(count, sources, targets):
+    offsets = array('i', [0]) * (count + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
 
-    def add_lib_dependency(self, dependency):
-        self.dependencies = self.dependencies.union(dependency)
+    adjacency = array('i', [0]) * len(targets)
+    positions = offsets[:-1]
+    for source, target in zip(sources, targets):
+        adjacency[positions[source]] = target
+        positions[source] += 1
 
-    def add_lib_parent(self, parent):
-        self.parents.add(parent)
+    return offsets, adjacency
 
 
-def vuln_search_recursive(path, target, project, proj_libs):
-    lib = project[target]
-    lib.is_visited = True
-    if lib.lib_name in proj_libs:
-        print(path)
+class LibGraph:
+    def __init__(self):
+        self.ids = dict()
+        self.names = list()
+        self.edges = set()
 
-    for parent in lib.parents:
-        if project[parent].is_visited:
+        self.child_offsets = self.child_ids = None
+        self.parent_offsets = self.parent_ids = None
+        self.is_visited = None
+        self.built_count = 0
+
+        # Изменения после build(): добавленные рёбра и удалённые рёбра из CSR.
+        self.extra_children = dict()
+        self.extra_parents = dict()
+        self.removed = set()
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        lib_id = self.ids.get(name)
+        if lib_id is None:
+            lib_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            if self.is_visited is not None:
+                self.is_visited.append(0)
+
+        return lib_id
+
+    def add_lib_dependency(self, parent, dependency):
+        self.edges.add(self.intern(parent) << ID_BITS | self.intern(dependency))
+
+    def build(self):
+        edges = sorted(self.edges)
+        self.edges = set()
+        parents = array('i', [edge >> ID_BITS for edge in edges])
+        children = array('i', [edge & ID_MASK for edge in edges])
+
+        self.child_offsets, self.child_ids = make_csr(len(self), parents, children)
+        self.parent_offsets, self.parent_ids = make_csr(len(self), children, parents)
+        self.is_visited = bytearray(len(self))
+        self.built_count = len(self)
+
+        self.extra_children = dict()
+        self.extra_parents = dict()
+        self.removed = set()
+
+    def compact(self):
+        self.edges = {parent << ID_BITS | child for parent in range(len(self)) for child in self.dependencies(parent)}
+        self.build()
+
+    def dependencies(self, lib_id):
+        if lib_id < self.built_count:
+            children = self.child_ids[self.child_offsets[lib_id]:self.child_offsets[lib_id + 1]]
+        else:
+            children = array('i')
+
+        if self.removed:
+            children = array('i', [child for child in children if lib_id << ID_BITS | child not in self.removed])
+        extra = self.extra_children.get(lib_id)
+        if extra:
+            children.extend(extra)
+
+        return children
+
+    def parents(self, lib_id):
+        if lib_id < self.built_count:
+            parents = self.parent_ids[self.parent_offsets[lib_id]:self.parent_offsets[lib_id + 1]]
+        else:
+            parents = array('i')
+
+        if self.removed:
+            parents = array('i', [parent for parent in parents if parent << ID_BITS | lib_id not in self.removed])
+        extra = self.extra_parents.get(lib_id)
+        if extra:
+            parents.extend(extra)
+
+        return parents
+
+    def has_edge(self, parent_id, child_id):
+        return child_id in self.dependencies(parent_id)
+
+    def add_edge(self, parent, dependency):
+        parent_id, child_id = self.intern(parent), self.intern(dependency)
+        if self.has_edge(parent_id, child_id):
+            return False
+
+        edge = parent_id << ID_BITS | child_id
+        if edge in self.removed:
+            self.removed.discard(edge)
+        else:
+            self.extra_children.setdefault(parent_id, set()).add(child_id)
+            self.extra_parents.setdefault(child_id, set()).add(parent_id)
+
+        return True
+
+    def remove_edge(self, parent, dependency):
+        parent_id, child_id = self.ids.get(parent), self.ids.get(dependency)
+        if parent_id is None or child_id is None or not self.has_edge(parent_id, child_id):
+            return False
+
+        extra = self.extra_children.get(parent_id)
+        if extra and child_id in extra:
+            extra.discard(child_id)
+            self.extra_parents[child_id].discard(parent_id)
+        else:
+            self.removed.add(parent_id << ID_BITS | child_id)
+
+        return True
+
+    def bitmap(self, names):
+        bits = bytearray(len(self))
+        for name in names:
+            bits[self.ids[name]] = 1
+
+        return bits
+
+
+class ReachabilityIndex:
+    MAGIC = b'VULNIDX1'
+    HEADER = struct.Struct('<8sQQQQ')
+
+    def __init__(self, graph, proj_libs):
+        self.graph = graph
+        self.proj_names = sorted(proj_libs)
+        self.proj_bits = {graph.intern(name): 1 << i for i, name in enumerate(self.proj_names)}
+
+        # exposure[lib_id] - битовое множество проектных библиотек, из которых достижима lib_id.
+        self.exposure = [0] * len(graph)
+        self.propagate(range(len(graph)))
+
+    def exposed(self, vuln_lib):
+        lib_id = self.graph.ids.get(vuln_lib)
+        if lib_id is None:
+            return []
+
+        result = list()
+        bits = self.exposure[lib_id]
+        while bits:
+            low_bit = bits & -bits
+            result.append(self.proj_names[low_bit.bit_length() - 1])
+            bits ^= low_bit
+
+        return result
+
+    def is_exposed(self, vuln_lib, proj_lib):
+        lib_id = self.graph.ids.get(vuln_lib)
+        proj_id = self.graph.ids.get(proj_lib)
+        if lib_id is None or proj_id not in self.proj_bits:
+            return False
+
+        return bool(self.exposure[lib_id] & self.proj_bits[proj_id])
+
+    def add_edge(self, parent, dependency):
+        if not self.graph.add_edge(parent, dependency):
+            return False
+
+        self.exposure.extend([0] * (len(self.graph) - len(self.exposure)))
+        parent_id, child_id = self.graph.ids[parent], self.graph.ids[dependency]
+        bits = self.exposure[parent_id]
+        stack = [child_id]
+
+        while stack:
+            lib_id = stack.pop()
+            if self.exposure[lib_id] & bits == bits:
+                continue
+
+            self.exposure[lib_id] |= bits
+            stack.extend(self.graph.dependencies(lib_id))
+
+        return True
+
+    def remove_edge(self, parent, dependency):
+        if not self.graph.remove_edge(parent, dependency):
+            return False
+
+        # Удаление ребра может затронуть только потомков dependency.
+        child_id = self.graph.ids[dependency]
+        affected = {child_id}
+        stack = [child_id]
+
+        while stack:
+            for lib_id in self.graph.dependencies(stack.pop()):
+                if lib_id not in affected:
+                    affected.add(lib_id)
+                    stack.append(lib_id)
+
+        self.propagate(affected)
+
+        return True
+
+    def propagate(self, nodes):
+        graph = self.graph
+        exposure = self.exposure
+        inside = set(nodes)
+
+        # Итеративный алгоритм Тарьяна на подграфе nodes.
+        index = dict()
+        low = dict()
+        scc_stack = list()
+        on_stack = set()
+        components = list()
+
+        for root in nodes:
+            if root in index:
+                continue
+
+            index[root] = low[root] = len(index)
+            scc_stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(graph.dependencies(root)))]
+
+            while work:
+                lib_id, children = work[-1]
+
+                for child in children:
+                    if child not in inside:
+                        continue
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        scc_stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(graph.dependencies(child))))
+                        break
+                    if child in on_stack and index[child] < low[lib_id]:
+                        low[lib_id] = index[child]
+                else:
+                    work.pop()
+                    if work and low[lib_id] < low[work[-1][0]]:
+                        low[work[-1][0]] = low[lib_id]
+
+                    if low[lib_id] == index[lib_id]:
+                        component = list()
+                        while True:
+                            member = scc_stack.pop()
+                            on_stack.discard(member)
+                            component.append(member)
+                            if member == lib_id:
+                                break
+                        components.append(component)
+
+        # Тарьян выдаёт компоненты от стоков к истокам, поэтому идём в обратном порядке.
+        for component in reversed(components):
+            members = set(component)
+            bits = 0
+
+            for member in component:
+                bits |= self.proj_bits.get(member, 0)
+                for parent in graph.parents(member):
+                    if parent not in members:
+                        bits |= exposure[parent]
+
+            for member in component:
+                exposure[member] = bits
+
+    def save(self, path):
+        graph = self.graph
+        graph.compact()
+
+        table = dict()
+        exposure_ids = array('i', [table.setdefault(bits, len(table)) for bits in self.exposure])
+        width = (len(self.proj_names) + 7) // 8
+
+        with open(path, 'wb') as file:
+            file.write(self.HEADER.pack(self.MAGIC, len(graph), len(graph.child_ids), len(self.proj_names), len(table)))
+            for strings in (graph.names, self.proj_names):
+                data = '\n'.join(strings).encode()
+                file.write(struct.pack('<Q', len(data)))
+                file.write(data)
+            # Массивы, как и заголовок, хранятся в little-endian независимо от платформы.
+            for arr in (graph.child_offsets, graph.child_ids, graph.parent_offsets, graph.parent_ids, exposure_ids):
+                if sys.byteorder == 'big':
+                    arr = array(arr.typecode, arr)
+                    arr.byteswap()
+                arr.tofile(file)
+            for bits in table:
+                file.write(bits.to_bytes(width, 'little'))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        magic, libs_count, edges_count, proj_count, table_size = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError('bad index file')
+        pos = cls.HEADER.size
+
+        strings = list()
+        for _ in range(2):
+            (size,) = struct.unpack_from('<Q', data, pos)
+            pos += 8
+            strings.append(data[pos:pos + size].decode().split('\n') if size else [])
+            pos += size
+
+        arrays = list()
+        for count in (libs_count + 1, edges_count, libs_count + 1, edges_count, libs_count):
+            arr = array('i')
+            arr.frombytes(data[pos:pos + count * arr.itemsize])
+            if sys.byteorder == 'big':
+                arr.byteswap()
+            arrays.append(arr)
+            pos += count * arr.itemsize
+
+        width = (proj_count + 7) // 8
+        table = [int.from_bytes(data[pos + i * width:pos + (i + 1) * width], 'little') for i in range(table_size)]
+
+        graph = LibGraph()
+        graph.names = strings[0]
+        graph.ids = {name: lib_id for lib_id, name in enumerate(graph.names)}
+        graph.child_offsets, graph.child_ids, graph.parent_offsets, graph.parent_ids, exposure_ids = arrays
+        graph.is_visited = bytearray(libs_count)
+        graph.built_count = libs_count
+
+        index = cls.__new__(cls)
+        index.graph = graph
+        index.proj_names = strings[1]
+        index.proj_bits = {graph.ids[name]: 1 << i for i, name in enumerate(index.proj_names)}
+        index.exposure = [table[i] for i in exposure_ids]
+
+        return index
+
+
+def find_useful_libs(proj_libs, graph):
+    useful = graph.bitmap(proj_libs)
+    stack = [graph.ids[name] for name in proj_libs]
+
+    while stack:
+        for dependency in graph.dependencies(stack.pop()):
+            if not useful[dependency]:
+                useful[dependency] = 1
+                stack.append(dependency)
+
+    return useful
+
+
+def make_path(chain, names):
+    path = list()
+
+    while chain is not None:
+        path.append(names[chain[0]])
+        chain = chain[1]
+
+    return ' '.join(path)
+
+
+def find_proj_distances(proj_libs, graph):
+    # Длина кратчайшей цепочки от библиотеки вверх до любой проектной библиотеки (-1 - недостижима).
+    distances = array('i', [-1]) * len(graph)
+    queue = deque(graph.ids[name] for name in proj_libs)
+    for lib_id in queue:
+        distances[lib_id] = 0
+
+    while queue:
+        lib_id = queue.popleft()
+        for dependency in graph.dependencies(lib_id):
+            if distances[dependency] == -1:
+                distances[dependency] = distances[lib_id] + 1
+                queue.append(dependency)
+
+    return distances
+
+
+def on_chain(lib_id, chain):
+    while chain is not None:
+        if chain[0] == lib_id:
+            return True
+        chain = chain[1]
+
+    return False
+
+
+def iter_paths(target, graph, proj_libs, useful, limit=None):
+    lib_id = graph.ids[target]
+    if not useful[lib_id] or limit == 0:
+        return
+
+    is_visited = graph.is_visited
+    is_visited[lib_id] = 1
+    chain = (lib_id, None)
+    stack = [(lib_id, iter(graph.parents(lib_id)), chain)]
+    found = 0
+
+    try:
+        if proj_libs[lib_id]:
+            found += 1
+            yield target
+
+        while stack and found != limit:
+            lib_id, parents, chain = stack[-1]
+
+            for parent in parents:
+                if is_visited[parent] or not useful[parent]:
+                    continue
+
+                is_visited[parent] = 1
+                parent_chain = (parent, chain)
+                stack.append((parent, iter(graph.parents(parent)), parent_chain))
+                if proj_libs[parent]:
+                    found += 1
+                    yield make_path(parent_chain, graph.names)
+                break
+            else:
+                is_visited[lib_id] = 0
+                stack.pop()
+    finally:
+        for lib_id, _, _ in stack:
+            is_visited[lib_id] = 0
+
+
+def vuln_search_iterative(target, graph, proj_libs, useful, out=sys.stdout):
+    for path in iter_paths(target, graph, proj_libs, useful):
+        out.write(f'{path}\n')
+
+
+def count_paths(target, graph, proj_libs, useful):
+    target_id = graph.ids[target]
+    if not useful[target_id]:
+        return dict()
+
+    # Подграф предков target, из которых достижимы проектные библиотеки.
+    ancestors = {target_id}
+    stack = [target_id]
+    while stack:
+        for parent in graph.parents(stack.pop()):
+            if useful[parent] and parent not in ancestors:
+                ancestors.add(parent)
+                stack.append(parent)
+
+    in_degree = dict.fromkeys(ancestors, 0)
+    for lib_id in ancestors:
+        for parent in graph.parents(lib_id):
+            if parent in ancestors:
+                in_degree[parent] += 1
+
+    # Динамика по топологическому порядку (алгоритм Кана) от target вверх.
+    paths = dict.fromkeys(ancestors, 0)
+    paths[target_id] = 1
+    order = [lib_id for lib_id, degree in in_degree.items() if degree == 0]
+    for lib_id in order:
+        for parent in graph.parents(lib_id):
+            if parent in ancestors:
+                paths[parent] += paths[lib_id]
+                in_degree[parent] -= 1
+                if in_degree[parent] == 0:
+                    order.append(parent)
+
+    if len(order) != len(ancestors):
+        # Среди предков есть цикл - простые пути приходится перебирать.
+        counts = dict()
+        for path in iter_paths(target, graph, proj_libs, useful):
+            proj_lib = path.split(' ', 1)[0]
+            counts[proj_lib] = counts.get(proj_lib, 0) + 1
+        return counts
+
+    return {graph.names[lib_id]: paths[lib_id] for lib_id in order if proj_libs[lib_id] and paths[lib_id]}
+
+
+def shortest_paths(target, graph, proj_libs, distances, k):
+    target_id = graph.ids[target]
+    if distances[target_id] == -1:
+        return []
+
+    # A* по простым путям: приоритет - длина цепочки плюс оценка distances до проектной библиотеки,
+    # поэтому готовые цепочки извлекаются в порядке неубывания длины. При равном приоритете
+    # первыми раскрываются более длинные цепочки, чтобы не перебирать всё равноценное множество вширь.
+    result = list()
+    heap = [(distances[target_id], 0, 0, 0, target_id, (target_id, None), False)]
+    counter = 1
+
+    while heap and len(result) < k:
+        _, _, _, depth, lib_id, chain, is_done = heapq.heappop(heap)
+        if is_done:
+            result.append(make_path(chain, graph.names))
             continue
-        vuln_search_recursive(parent + ' ' + path, parent, project, proj_libs)
 
-    lib.is_visited = False
+        if proj_libs[lib_id]:
+            heapq.heappush(heap, (depth, -depth, counter, depth, lib_id, chain, True))
+            counter += 1
 
+        for parent in graph.parents(lib_id):
+            if distances[parent] == -1 or on_chain(parent, chain):
+                continue
+            heapq.heappush(heap, (depth + 1 + distances[parent], -depth - 1, counter, depth + 1, parent,
+                                  (parent, chain), False))
+            counter += 1
 
-# def vuln_search_iterative(start_lib, project, vuln_libs):
-#     stack = [(start_lib, [start_lib])]
-#     while len(stack):
-#         (curr_lib, path) = stack.pop()
-#
-#         if curr_lib in vuln_libs:
-#             print(' '.join(path))
-#
-#         project[curr_lib].is_visited = True
-#
-#         for lib_dependency in project[curr_lib].dependencies:
-#             stack.append((lib_dependency, path + [lib_dependency]))
+    return result
 
 
 def make_proj_graph():
-    project = dict()
+    graph = LibGraph()
     vuln_libs = set(input().split())
     proj_libs = set(input().split())
 
     for lib_name in proj_libs.union(vuln_libs):
-        if project.get(lib_name) is None:
-            project[lib_name] = Lib(name=lib_name)
+        graph.intern(lib_name)
 
     for libs_list in sys.stdin:
-        if libs_list == '\n':
+        libs_list = libs_list.split()
+        if not libs_list:
             continue
 
-        libs_list = libs_list.rstrip().split()
-
-        for lib_name in libs_list:
-            if project.get(lib_name) is None:
-                project[lib_name] = Lib(name=lib_name)
-
         parent = libs_list[0]
-        dependencies = libs_list[1:]
+        graph.intern(parent)
 
-        project[parent].add_lib_dependency(dependency=dependencies)
+        for dependency in libs_list[1:]:
+            graph.add_lib_dependency(parent, dependency)
 
-        for dependency in dependencies:
-            project[dependency].add_lib_parent(parent=parent)
+    graph.build()
 
-    return vuln_libs, proj_libs, project
+    return vuln_libs, proj_libs, graph
 
 
 if __name__ == '__main__':
+    # Режимы: без аргументов - все пути, "count" - число путей до каждой проектной библиотеки,
+    # "shortest K" - K кратчайших цепочек, "limit N" - не более N путей на уязвимую библиотеку.
+    mode = sys.argv[1] if len(sys.argv) > 1 else None
+    mode_arg = sys.argv[2] if len(sys.argv) > 2 else None
 
-    vulnerable_libs, project_libs, graph = make_proj_graph()
+    if mode in ('shortest', 'limit'):
+        if mode_arg is None or not mode_arg.isdecimal() or len(sys.argv) > 3:
+            sys.exit(f'usage: vuln_search.py {mode} {"K" if mode == "shortest" else "N"}')
+        mode_arg = int(mode_arg)
+    elif mode not in (None, 'count') or mode_arg is not None:
+        sys.exit('usage: vuln_search.py [count | shortest K | limit N]')
 
-    for vuln_lib in vulnerable_libs:
-        vuln_search_recursive(path=vuln_lib, target=vuln_lib, project=graph, proj_libs=project_libs)
+    vulnerable_libs, project_libs, lib_graph = make_proj_graph()
+    project_bitmap = lib_graph.bitmap(project_libs)
+    useful_libs = find_useful_libs(project_libs, lib_graph)
+    proj_distances = find_proj_distances(project_libs, lib_graph) if mode == 'shortest' else None
+    output = sys.stdout
 
-    # for proj_lib in project_libs:
-    #     vuln_search_iterative(start_lib=proj_lib, project=graph, vuln_libs=vulnerable_libs)
\ No newline at end of file
+    for vuln_lib in vulnerable_libs:
+        if mode == 'count':
+            for proj_lib, count in sorted(count_paths(vuln_lib, lib_graph, project_bitmap, useful_libs).items()):
+                output.write(f'{vuln_lib} {proj_lib} {count}\n')
+        elif mode == 'shortest':
+            for path in shortest_paths(vuln_lib, lib_graph, project_bitmap, proj_distances, mode_arg):
+                output.write(f'{path}\n')
+        elif mode == 'limit':
+            for path in iter_paths(vuln_lib, lib_graph, project_bitmap, useful_libs, limit=mode_arg):
+                output.write(f'{path}\n')
+        else:
+            vuln_search_iterative(target=vuln_lib, graph=lib_graph, proj_libs=project_bitmap, useful=useful_libs)
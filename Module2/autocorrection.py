@@ -1,133 +1,168 @@
-from collections import defaultdict
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict, deque
+from itertools import islice
+from os.path import commonprefix
+import mmap
+import multiprocessing
+import os
+import random
+import struct
 import sys
+import time
+
+MAX_CHAR = chr(0x10FFFF)
+INDEX_MAGIC = b'TRIEIDX3'
+MAX_COUNT = (1 << 64) - 1
+INDEX_HEADER = struct.Struct('<8sII')
+BATCH_SIZE = 1 << 14
 
 # Статья про автомат Левенштейна (habr): https://habr.com/ru/post/275937/
 # Статья с википедии: https://en.wikipedia.org/wiki/Levenshtein_automaton
 
 
-class State:
-    def __init__(self, node=None, word_idx=0, final_word_idx=0, dist=0):
-        self.node = node                        # Текущий узел (указатель на него).
-        self.word_idx = word_idx                # Индекс проверяемого слова.
-        self.final_word_idx = final_word_idx    # Индекс слова, по которому происходит проверка.
-        self.distance = dist                    # Коррекционное расстояние
-        self.symbol = ''                        # Предыдущий символ, для проверки транспозиции
-
-
 class SpellChecker:
-    def __init__(self):
+    def __init__(self, max_distance=1):
         self.result = dict()        # Словарь, в котором: ключ - коррекционное расстояние,
                                     #                     значение - set() из слов (из дерева) с данным расстоянием).
-
-        self.state_stack = list()   # Стек состояний автомата Левенштейна.
-
-    # Добавление состояния, где метод коррекции - удаление символа.
-    def add_deletion_state(self, stack_item):
-        self.state_stack.append(State(node=stack_item.node, word_idx=stack_item.word_idx + 1,
-                                      final_word_idx=stack_item.final_word_idx, dist=1))
-
-    # Добавление состояния, где метод коррекции - вставка символа.
-    def add_insertion_state(self, stack_item):
-        self.state_stack.append(State(node=stack_item.node, word_idx=stack_item.word_idx,
-                                      final_word_idx=stack_item.final_word_idx + 1, dist=1))
-
-    # Добавление состояния, где метод коррекции - изменение символа.
-    def add_modification_state(self, stack_item, distance):
-        self.state_stack.append(State(node=stack_item.node, word_idx=stack_item.word_idx + 1,
-                                      final_word_idx=stack_item.final_word_idx + 1, dist=distance))
-
-    # Добавление состояния, где метод коррекции - транспозиция символов.
-    def add_transposition_state(self, stack_item, symbol, distance):
-        new_item = State(node=stack_item.node, word_idx=stack_item.word_idx + 1,
-                         final_word_idx=stack_item.final_word_idx + 1, dist=distance)
-        new_item.symbol = symbol
-        self.state_stack.append(new_item)
-
-    # Метод добавление детей текущего состояния.
-    def add_new_states(self, stack_item):
-        for child in stack_item.node.children.values():
-            new_state = State(node=child, word_idx=stack_item.word_idx,
-                              final_word_idx=0, dist=stack_item.distance)
-            new_state.symbol = stack_item.symbol
-            self.state_stack.append(new_state)
+        self.frequencies = dict()   # Частоты найденных слов из словаря.
+        self.max_distance = max_distance
 
     # Метод проверки правописания.
-    # Сложность данного метода определяется длиной искомого слова n
-    # и мощностью алфавита k=const, таким образом в худшем случаем
-    # мы имеем сложность O(k * n)
-    def check_spell(self, trie, word):
-        # Заносим всех детей корня дерева в качестве состояний автомата.
-        for child in trie.root.children.values():
-            self.state_stack.append(State(node=child))
-
-        while len(self.state_stack) != 0:
-            # Изымаем состояние из стека состояний.
-            stack_item = self.state_stack.pop(len(self.state_stack) - 1)
-
-            # Полное совпадение префиксов -> слово найдено -> надо добавить его в словарь.
-            if stack_item.node.is_word:
-                # Нашли искомое слово.
-                if stack_item.word_idx == len(word) and stack_item.final_word_idx == len(
-                        stack_item.node.node_key) and stack_item.distance == 0:
-                    if self.result.get("0") is None:
-                        self.result["0"] = stack_item.node.final_word
-
-                # Где-то был совершен переход в новое состояние (вставка, удаление, транспозиция).
-                elif stack_item.word_idx == len(word) and stack_item.final_word_idx == len(
-                        stack_item.node.node_key) and stack_item.distance == 1:
-                    if self.result.get("1") is None:
-                        self.result["1"] = set()
-                    self.result["1"].add(stack_item.node.final_word)
-
-                # Искомое слово включает префикс который мы обрабатываем.
-                elif stack_item.word_idx == len(word) - 1 and stack_item.final_word_idx == len(
-                        stack_item.node.node_key) and stack_item.distance == 0:
-                    if self.result.get("1") is None:
-                        self.result["1"] = set()
-                    self.result["1"].add(stack_item.node.final_word)
-
-                # Префикс включает искомое слово.
-                elif stack_item.word_idx == len(word) and stack_item.final_word_idx == len(
-                        stack_item.node.node_key) - 1 and stack_item.distance == 0:
-                    if self.result.get("1") is None:
-                        self.result["1"] = set()
-                    self.result["1"].add(stack_item.node.final_word)
-
-            # Добавляем детей текущего состояния.
-            if stack_item.final_word_idx == len(stack_item.node.node_key):
-                self.add_new_states(stack_item)
-                continue
+    # Обход дерева в глубину, на каждом символе ключа узла столбец матрицы расстояний
+    # Дамерау-Левенштейна (с транспозицией соседних символов) обновляется бит-параллельно
+    # (алгоритм Хюрё): состояние - несколько целых чисел, поэтому работа на символ - O(1)
+    # операций над числами длины |word| бит. Поддерево отсекается, как только все клетки
+    # столбца в полосе |i - j| <= max_distance больше max_distance: из такого префикса
+    # слово на допустимом расстоянии не получить.
+    # Почти все дети отсекаются на первом символе, и обычно этого символа нет в слове (eq = 0).
+    # Такой переход одинаков для всех детей узла, поэтому он считается один раз при раскрытии
+    # узла, и если он отсекает поддерево, эти дети даже не попадают в стек.
+    def check_spell(self, trie, word, max_distance=None):
+        if max_distance is None:
+            max_distance = self.max_distance
+        length = len(word)
+        full = (1 << length) - 1
+
+        # peq[c] - маска позиций символа c в проверяемом слове.
+        peq = dict()
+        for i, char in enumerate(word):
+            peq[char] = peq.get(char, 0) | 1 << i
+
+        # Состояние: (узел, ключ узла, VP, VN, D0, маска предыдущего символа, глубина).
+        # Начальный столбец D[i][0] = i: все вертикальные разности равны +1.
+        stack = [(trie.root, trie.node_key(trie.root), full, 0, 0, 0, 0)]
+        node_key, children, is_word, get_eq = trie.node_key, trie.children, trie.is_word, peq.get
+
+        while stack:
+            node, key, vp, vn, d0, prev_eq, depth = stack.pop()
+
+            for char in key:
+                eq = get_eq(char, 0)
+                transposition = ((~d0 & eq) << 1) & prev_eq
+                d0 = ((((eq & vp) + vp) ^ vp) | eq | vn | transposition) & full
+                hp = vn | ~(d0 | vp) & full
+                hn = d0 & vp
+                hp = (hp << 1 | 1) & full
+                hn = (hn << 1) & full
+                vp = hn | ~(d0 | hp) & full
+                vn = hp & d0
+                prev_eq = eq
+                depth += 1
+
+                if band_exceeded(vp, vn, depth, length, max_distance):
+                    break
+            else:
+                if is_word(node):
+                    distance = depth + vp.bit_count() - vn.bit_count()
+                    if distance <= max_distance:
+                        final_word = trie.final_word(node)
+                        self.frequencies[final_word] = trie.frequency(node)
+                        if distance == 0:
+                            self.result["0"] = final_word
+                        else:
+                            self.result.setdefault(str(distance), set()).add(final_word)
+
+                # Переход по символу, которого нет в слове: D0 = VN, HN = 0, транспозиции нет.
+                hp = (~vp & full) << 1 | 1
+                zero_vp = ~(vn | hp) & full
+                zero_vn = hp & vn
+                zero_cut = band_exceeded(zero_vp, zero_vn, depth + 1, length, max_distance)
+
+                for child in children(node):
+                    child_key = node_key(child)
+                    if zero_cut and child_key[0] not in peq:
+                        continue
+                    stack.append((child, child_key, vp, vn, d0, prev_eq, depth))
 
-            # Дошли до конца исходного слова.
-            if stack_item.word_idx == len(word):
-                continue
+        return self.result
 
-            # Проверяем транспозицию.
-            if stack_item.symbol != '':
-                # Если транспозиция применялась:
-                if word[stack_item.word_idx - 1] == stack_item.node.node_key[stack_item.final_word_idx] and \
-                        word[stack_item.word_idx] == stack_item.symbol:
-                    self.add_transposition_state(stack_item, '', stack_item.distance)
+    # Не более limit исправлений (вместе с самим словом, если оно есть в словаре),
+    # упорядоченных по расстоянию, затем по убыванию частоты, затем по алфавиту.
+    # Порог расстояния поднимается постепенно: если на меньшем расстоянии уже набралось
+    # limit слов, более далёкие слова в ответ не попадут и дорогой поиск не нужен.
+    def suggest(self, trie, word, limit=None):
+        first_distance = 0 if limit else self.max_distance
+
+        for max_distance in range(first_distance, self.max_distance + 1):
+            self.result = dict()
+            self.check_spell(trie, word, max_distance)
+            found = sum(1 if distance == "0" else len(words) for distance, words in self.result.items())
+            if limit and found >= limit:
+                break
 
-            # Не было транспозиции -> символы совпали.
-            elif stack_item.node.node_key[stack_item.final_word_idx] == word[stack_item.word_idx]:
-                self.add_modification_state(stack_item, stack_item.distance)
+        ranked = list()
+        for distance, words in self.result.items():
+            for final_word in ([words] if distance == "0" else words):
+                ranked.append((int(distance), -self.frequencies[final_word], final_word))
+        ranked.sort()
 
-            # Если символы не совпали, добавляем новые состояния.
-            else:
-                if stack_item.distance == 0:
-                    self.add_deletion_state(stack_item)
-                    self.add_insertion_state(stack_item)
-                    self.add_modification_state(stack_item, 1)
-                    self.add_transposition_state(stack_item, stack_item.node.node_key[stack_item.final_word_idx], 1)
+        return [final_word for _, _, final_word in ranked[:limit]]
 
-        return self.result
+
+# Минимумы префиксных сумм полосы: для max_distance = k индекс - 2k бит VP и 2k бит VN
+# начиная со строки depth - k, значение - минимум D[i] - D[depth - k] по строкам полосы.
+BAND_MINIMA = dict()
+
+
+def band_minima(max_distance):
+    if max_distance not in BAND_MINIMA:
+        width = 2 * max_distance
+        minima = list()
+        for vp in range(1 << width):
+            for vn in range(1 << width):
+                value = minimum = 0
+                for bit in range(width):
+                    value += (vp >> bit & 1) - (vn >> bit & 1)
+                    minimum = min(minimum, value)
+                minima.append(minimum)
+        BAND_MINIMA[max_distance] = minima
+
+    return BAND_MINIMA[max_distance]
+
+
+# Все ли клетки столбца в полосе |i - depth| <= max_distance больше max_distance;
+# вне полосы D[i][depth] >= |i - depth| > max_distance. D[i] = depth + popcount(VP и VN по строкам < i).
+def band_exceeded(vp, vn, depth, length, max_distance):
+    low = depth - max_distance
+    if low <= 0:
+        return False
+    if low > length:
+        return True
+
+    mask = (1 << low) - 1
+    width = 2 * max_distance
+    band = (1 << width) - 1
+    value = depth + (vp & mask).bit_count() - (vn & mask).bit_count()
+
+    return value + band_minima(max_distance)[(vp >> low & band) << width | vn >> low & band] > max_distance
 
 
 class TrieNode:
-    def __init__(self, is_word=False, keys=None, final_word='', node_key=''):
+    def __init__(self, is_word=False, keys=None, final_word='', node_key='', frequency=0):
         self.final_word = final_word                             # Итоговое слово.
         self.is_word = is_word                                   # Индикатор конца слова.
+        self.frequency = frequency                               # Частота слова.
         self.children = keys if keys else defaultdict(TrieNode)  # Указатели на детей узла.
         self.node_key = node_key                                 # Ключ узла.
 
@@ -136,8 +171,29 @@ class Trie:
     def __init__(self):
         self.root = TrieNode()
 
-    def insert(self, word):
-        self.inner_insert(self.root, word, word)
+    def insert(self, word, frequency=0):
+        self.inner_insert(self.root, word, word, frequency)
+
+    # Методы доступа к узлам, общие с CompactTrie: по ним ходит SpellChecker.
+    @staticmethod
+    def children(node):
+        return node.children.values()
+
+    @staticmethod
+    def node_key(node):
+        return node.node_key
+
+    @staticmethod
+    def is_word(node):
+        return node.is_word
+
+    @staticmethod
+    def final_word(node):
+        return node.final_word
+
+    @staticmethod
+    def frequency(node):
+        return node.frequency
 
     @staticmethod
     # Метод проверки совпадения слова и ключа.
@@ -160,7 +216,7 @@ class Trie:
     # это узел, необходимо делать проверку, которая, поскольку
     # я использую defaultdict(=dict), занимает O(1), таких проверок будет k.
     # Учитывая мощность алфавита (n), получим сложность вставки O(n * k).
-    def inner_insert(node=None, word='', final_word=''):
+    def inner_insert(node=None, word='', final_word='', frequency=0):
         for key, child in node.children.items():
             prefix, suffix, word_part = Trie.match(key, word)
 
@@ -169,42 +225,452 @@ class Trie:
                 if not word_part:
                     # Совпало само слово.
                     child.is_word = True
+                    child.final_word = final_word
+                    child.frequency += frequency
                     return True
                 else:
                     # Совпала часть слова (слово без префикса)
-                    return Trie.inner_insert(node=child, word=word_part, final_word=final_word)
+                    return Trie.inner_insert(node=child, word=word_part, final_word=final_word,
+                                             frequency=frequency)
 
             # Случай частичного совпадения ключа -> нужно разбить текущий узел.
             if prefix:
                 child.node_key = suffix
-                new_node = TrieNode(is_word=not word_part, keys={suffix: child}, node_key=prefix, final_word=final_word)
+                new_node = TrieNode(is_word=not word_part, keys={suffix: child}, node_key=prefix, final_word=final_word,
+                                    frequency=0 if word_part else frequency)
                 node.children[prefix] = new_node
                 del node.children[key]
-                return Trie.inner_insert(node=new_node, word=word_part, final_word=final_word)
+                if not word_part:
+                    return True
+                return Trie.inner_insert(node=new_node, word=word_part, final_word=final_word, frequency=frequency)
 
-        node.children[word] = TrieNode(is_word=True, node_key=word, final_word=final_word)
+        node.children[word] = TrieNode(is_word=True, node_key=word, final_word=final_word, frequency=frequency)
 
 
-if __name__ == '__main__':
-    trie = Trie()
-    dict_size = int(input())
+class CompactTrie:
+    # Неизменяемое сжатое префиксное дерево в плоских массивах.
+    # Узлы пронумерованы в порядке обхода в ширину, поэтому дети узла i - это
+    # узлы first_child[i]..first_child[i + 1] - 1. Ключ узла i - labels[label_offsets[i]:label_offsets[i + 1]].
+    # Слова целиком не хранятся: final_word собирается по цепочке parents.
+    # counts[i] - частота слова, которое заканчивается в узле i (uint64).
+    def __init__(self):
+        self.root = 0
+        self.labels = ''
+        self.label_offsets = array('I', [0, 0])
+        self.first_child = array('I', [1, 1])
+        self.parents = array('I', [0])
+        self.counts = array('Q', [0])
+        self.words = bytearray(1)
+
+    @classmethod
+    def from_words(cls, words, frequencies=None):
+        # Построение за один проход по отсортированному списку: каждый узел соответствует
+        # диапазону слов [lo, hi) с общим префиксом длины depth.
+        words = sorted(set(words))
+        if words and words[0] == '':
+            words.pop(0)
+
+        trie = cls()
+        labels = list()
+        label_end = 0
+        label_offsets = array('I', [0, 0])
+        first_child = array('I')
+        parents = array('I', [0])
+        counts = array('Q', [0])
+        is_word = bytearray(1)
+        frequencies = frequencies or dict()
+        if any(not 0 <= count <= MAX_COUNT for count in frequencies.values()):
+            raise ValueError('frequency out of range')
+        queue = deque([(0, len(words), 0)])
+
+        while queue:
+            lo, hi, depth = queue.popleft()
+            first_child.append(len(parents))
+
+            while lo < hi:
+                prefix = words[lo][:depth + 1]
+                group_end = bisect_right(words, prefix + MAX_CHAR, lo, hi)
+
+                first, last = words[lo], words[group_end - 1]
+                lcp = len(first) if group_end - lo == 1 else len(commonprefix((first, last)))
+
+                node = len(parents)
+                parents.append(len(first_child) - 1)
+                labels.append(first[depth:lcp])
+                label_end += lcp - depth
+                label_offsets.append(label_end)
+                is_word.append(len(first) == lcp)
+                counts.append(frequencies.get(first, 0) if is_word[node] else 0)
+
+                queue.append((lo + is_word[node], group_end, lcp))
+                lo = group_end
+
+        first_child.append(len(parents))
+
+        trie.labels = ''.join(labels)
+        trie.label_offsets = label_offsets
+        trie.first_child = first_child
+        trie.parents = parents
+        trie.counts = counts
+        trie.words = is_word
+
+        return trie
+
+    def children(self, node):
+        return range(self.first_child[node], self.first_child[node + 1])
+
+    def node_key(self, node):
+        return self.labels[self.label_offsets[node]:self.label_offsets[node + 1]]
+
+    def is_word(self, node):
+        return self.words[node] == 1
+
+    def frequency(self, node):
+        return self.counts[node]
+
+    def final_word(self, node):
+        parts = list()
+        while node != self.root:
+            parts.append(self.node_key(node))
+            node = self.parents[node]
+
+        return ''.join(reversed(parts))
+
+    # Формат файла: заголовок, затем label_offsets (смещения в байтах UTF-8), first_child,
+    # parents (uint32), counts (uint64; всё, как и заголовок, - little-endian), флаги words и ключи узлов в UTF-8.
+    def save(self, path):
+        label_offsets = array('I', [0])
+        labels = list()
+        for node in range(len(self.parents)):
+            label = self.node_key(node).encode()
+            labels.append(label)
+            label_offsets.append(label_offsets[-1] + len(label))
+
+        with open(path, 'wb') as file:
+            file.write(INDEX_HEADER.pack(INDEX_MAGIC, len(self.parents), label_offsets[-1]))
+            for arr in (label_offsets, self.first_child, self.parents, self.counts):
+                arr = array('Q' if arr is self.counts else 'I', arr)
+                if sys.byteorder == 'big':
+                    arr.byteswap()
+                arr.tofile(file)
+            file.write(self.words)
+            file.writelines(labels)
+
+
+class MappedTrie(CompactTrie):
+    # CompactTrie, который работает прямо со страницами файла, созданного CompactTrie.save:
+    # массивы не копируются, а открываются как memoryview поверх mmap.
+    def __init__(self, path):
+        super().__init__()
+
+        self.path = path
+        with open(path, 'rb') as file:
+            self.mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self.mapped)
+        magic, nodes_count, labels_size = INDEX_HEADER.unpack_from(view)
+        if magic != INDEX_MAGIC:
+            raise ValueError('bad index file')
+
+        pos = INDEX_HEADER.size
+        self.label_offsets, pos = view[pos:pos + 4 * (nodes_count + 1)].cast('I'), pos + 4 * (nodes_count + 1)
+        self.first_child, pos = view[pos:pos + 4 * (nodes_count + 1)].cast('I'), pos + 4 * (nodes_count + 1)
+        self.parents, pos = view[pos:pos + 4 * nodes_count].cast('I'), pos + 4 * nodes_count
+        self.counts, pos = view[pos:pos + 8 * nodes_count].cast('Q'), pos + 8 * nodes_count
+        self.words, pos = view[pos:pos + nodes_count], pos + nodes_count
+        self.labels = view[pos:pos + labels_size]
+
+        # На big-endian массивы приходится копировать с перестановкой байтов.
+        if sys.byteorder == 'big':
+            for name in ('label_offsets', 'first_child', 'parents', 'counts'):
+                arr = array('Q' if name == 'counts' else 'I', getattr(self, name))
+                arr.byteswap()
+                setattr(self, name, arr)
+
+    def node_key(self, node):
+        return str(self.labels[self.label_offsets[node]:self.label_offsets[node + 1]], 'utf-8')
+
+
+# Расстояние Дамерау-Левенштейна (с транспозицией соседних символов) между двумя словами,
+# тот же бит-параллельный пересчёт столбца, что и в SpellChecker.check_spell.
+def osa_distance(word, other):
+    full = (1 << len(word)) - 1
+    peq = dict()
+    for i, char in enumerate(word):
+        peq[char] = peq.get(char, 0) | 1 << i
+
+    vp, vn, d0, prev_eq = full, 0, 0, 0
+    for char in other:
+        eq = peq.get(char, 0)
+        transposition = ((~d0 & eq) << 1) & prev_eq
+        d0 = ((((eq & vp) + vp) ^ vp) | eq | vn | transposition) & full
+        hp = vn | ~(d0 | vp) & full
+        hn = d0 & vp
+        hp = (hp << 1 | 1) & full
+        hn = (hn << 1) & full
+        vp = hn | ~(d0 | hp) & full
+        vn = hp & d0
+        prev_eq = eq
+
+    return len(other) + vp.bit_count() - vn.bit_count()
+
+
+# Все варианты слова, получаемые удалением не более max_distance символов (вместе с самим словом).
+def deletes(word, max_distance):
+    variants = {word}
+    edge = [word]
+
+    for _ in range(max_distance):
+        next_edge = list()
+        for item in edge:
+            for i in range(len(item)):
+                variant = item[:i] + item[i + 1:]
+                if variant not in variants:
+                    variants.add(variant)
+                    next_edge.append(variant)
+        edge = next_edge
+
+    return variants
+
+
+class SymSpellIndex:
+    # Альтернатива обходу дерева (SymSpell): для каждого слова словаря заранее сохраняются
+    # все варианты с удалёнными символами. Если два слова на расстоянии не больше d, у них есть
+    # общий вариант, полученный не более чем d удалениями с каждой стороны, поэтому проверка
+    # сводится к нескольким обращениям к словарю и точному подсчёту расстояния для кандидатов.
+    def __init__(self, words, frequencies=None, max_distance=1):
+        self.max_distance = max_distance
+        self.frequencies = frequencies or dict()
+        # Пустое слово отбрасывается, как и в CompactTrie.from_words.
+        self.words = set(words)
+        self.words.discard('')
+        self.index = dict()     # Вариант -> слово или список слов, из которых он получается.
+
+        for word in self.words:
+            for variant in deletes(word, max_distance):
+                bucket = self.index.get(variant)
+                if bucket is None:
+                    self.index[variant] = word
+                elif type(bucket) is str:
+                    self.index[variant] = [bucket, word]
+                else:
+                    bucket.append(word)
+
+    # Результат в том же формате, что и у SpellChecker.check_spell.
+    def check_spell(self, word, max_distance=None):
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        result = dict()
+        if word in self.words:
+            result["0"] = word
+
+        candidates = set()
+        for variant in deletes(word, max_distance):
+            bucket = self.index.get(variant)
+            if bucket is None:
+                continue
+            if type(bucket) is str:
+                candidates.add(bucket)
+            else:
+                candidates.update(bucket)
+        candidates.discard(word)
+
+        for candidate in candidates:
+            if abs(len(candidate) - len(word)) > max_distance:
+                continue
+            distance = osa_distance(word, candidate)
+            if distance <= max_distance:
+                result.setdefault(str(distance), set()).add(candidate)
+
+        return result
+
+
+# Результат проверки одного слова: (True, ()) - слово есть в словаре,
+# (False, suggestions) - отсортированный кортеж исправлений (пустой, если исправлений нет).
+# trie - дерево (Trie, CompactTrie, MappedTrie) или SymSpellIndex.
+def check_word(trie, word):
+    if isinstance(trie, SymSpellIndex):
+        result = trie.check_spell(word, 1)
+    else:
+        result = SpellChecker().check_spell(trie, word)
+
+    if result.get("0"):
+        return True, ()
+
+    return False, tuple(sorted(result.get("1", ())))
+
+
+worker_trie = None
+
+
+def init_worker(trie):
+    global worker_trie
+    worker_trie = MappedTrie(trie) if isinstance(trie, str) else trie
+
 
-    for i in range(dict_size):
-        trie.insert(input().lower())
+def check_chunk(words):
+    return [check_word(worker_trie, word) for word in words]
 
-    for line in sys.stdin:
-        if line == "\n":
-            continue
 
-        line = line[:-1]
+class BatchSpellChecker:
+    # Пакетная проверка: повторы в пакете проверяются один раз, недавние результаты
+    # хранятся в LRU-кэше, а большие пакеты раздаются пулу процессов. Дерево только читается,
+    # поэтому процессы получают его при fork без копирования (MappedTrie - по пути к индексу).
+    def __init__(self, trie, cache_size=1 << 16, processes=1, parallel_threshold=1024):
+        self.trie = trie
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.processes = processes
+        self.parallel_threshold = parallel_threshold
+        self.pool = None
 
-        checker = SpellChecker()
-        result = checker.check_spell(trie, line.lower())
+    def __enter__(self):
+        return self
 
-        if result.get("0"):
-            print(f"{line} - ok")
-        elif result.get("1"):
-            words = result.get("1")
-            print(f"{line} -> {', '.join(sorted(words))}")
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def remember(self, word, result):
+        self.cache[word] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def check_many(self, words):
+        results = dict()
+        missing = list()
+
+        for word in dict.fromkeys(words):
+            result = self.cache.get(word)
+            if result is None:
+                missing.append(word)
+            else:
+                self.cache.move_to_end(word)
+                results[word] = result
+
+        if self.processes > 1 and len(missing) >= self.parallel_threshold:
+            if self.pool is None:
+                shared = self.trie.path if isinstance(self.trie, MappedTrie) else self.trie
+                self.pool = multiprocessing.Pool(self.processes, initializer=init_worker, initargs=(shared,))
+
+            chunk_size = -(-len(missing) // (4 * self.processes))
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            found = [result for chunk in self.pool.map(check_chunk, chunks) for result in chunk]
         else:
-            print(f"{line} -?")
\ No newline at end of file
+            found = [check_word(self.trie, word) for word in missing]
+
+        for word, result in zip(missing, found):
+            results[word] = result
+            self.remember(word, result)
+
+        return [results[word] for word in words]
+
+
+# Строка словаря - слово и, необязательно, его частота через пробел.
+def read_words():
+    dict_size = int(input())
+    words = list()
+    frequencies = dict()
+
+    for _ in range(dict_size):
+        # Частотой считается только последнее слово строки из цифр; иначе вся строка - слово.
+        line = input().lower()
+        word, _, frequency = line.rpartition(' ')
+        if not word or not frequency.isdecimal():
+            word = line
+            frequency = ''
+
+        words.append(word)
+        if frequency:
+            frequencies[word] = frequencies.get(word, 0) + int(frequency)
+
+    return words, frequencies
+
+
+def read_dictionary():
+    return CompactTrie.from_words(*read_words())
+
+
+# Сравнение CompactTrie и SymSpellIndex: словари из случайных слогов разного размера и три вида
+# запросов - слова словаря, слова с одной заменённой буквой и случайные строки.
+def bench(sizes=(10000, 100000, 300000), queries_count=300, out=sys.stdout):
+    rnd = random.Random(4)
+    syllables = [consonant + vowel for consonant in 'bcdfghklmnprstvz' for vowel in 'aeiou']
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+
+    for size in sizes:
+        words = list({''.join(rnd.choice(syllables) for _ in range(rnd.randint(1, 5))) for _ in range(size)})
+
+        start = time.perf_counter()
+        trie = CompactTrie.from_words(words)
+        trie_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = SymSpellIndex(words)
+        index_build = time.perf_counter() - start
+
+        out.write(f'{len(words)} words: build trie {trie_build:.2f}s, symspell {index_build:.2f}s '
+                  f'({len(index.index)} keys)\n')
+
+        for kind in ('correct', 'typo', 'random'):
+            queries = list()
+            for word in rnd.sample(words, min(queries_count, len(words))):
+                if kind == 'typo':
+                    pos = rnd.randrange(len(word))
+                    word = word[:pos] + rnd.choice(letters) + word[pos + 1:]
+                elif kind == 'random':
+                    word = ''.join(rnd.choice(letters) for _ in range(len(word)))
+                queries.append(word)
+
+            timings = list()
+            for engine in (trie, index):
+                start = time.perf_counter()
+                for query in queries:
+                    check_word(engine, query)
+                timings.append((time.perf_counter() - start) / len(queries) * 1000)
+
+            out.write(f'  {kind:8} trie {timings[0]:.3f} ms/q, symspell {timings[1]:.3f} ms/q\n')
+
+
+if __name__ == '__main__':
+    # "build PATH" - собрать словарь из stdin и сохранить индекс в PATH;
+    # "symspell" - словарь и слова читаются из stdin, проверка через SymSpellIndex;
+    # "PATH" - проверять слова из stdin по готовому индексу;
+    # "bench" - сравнение CompactTrie и SymSpellIndex на сгенерированных словарях;
+    # без аргументов - словарь и слова читаются из stdin.
+    if len(sys.argv) == 2 and sys.argv[1] == 'bench':
+        bench()
+        sys.exit()
+
+    if len(sys.argv) == 3 and sys.argv[1] == 'build':
+        read_dictionary().save(sys.argv[2])
+        sys.exit()
+
+    if len(sys.argv) == 2 and sys.argv[1] == 'symspell':
+        trie = SymSpellIndex(*read_words())
+    elif len(sys.argv) == 2:
+        trie = MappedTrie(sys.argv[1])
+    else:
+        trie = read_dictionary()
+
+    with BatchSpellChecker(trie, processes=os.cpu_count() or 1) as checker:
+        batch = list(islice(sys.stdin, BATCH_SIZE))
+
+        while batch:
+            lines = [line[:-1] for line in batch if line != "\n"]
+
+            for line, (is_ok, words) in zip(lines, checker.check_many([line.lower() for line in lines])):
+                if is_ok:
+                    print(f"{line} - ok")
+                elif words:
+                    print(f"{line} -> {', '.join(words)}")
+                else:
+                    print(f"{line} -?")
+
+            batch = list(islice(sys.stdin, BATCH_SIZE))
@@ -0,0 +1,30 @@
+# Буферизованный вывод для print/dump: мелкие записи копятся и сбрасываются в output блоками
+# не меньше limit символов, пропуски "_ " пишутся кусками фиксированной длины, так что память
+# не растёт с шириной уровня.
+class LevelWriter:
+    GAP_TOKENS = 4096
+    GAP_CHUNK = '_ ' * GAP_TOKENS
+
+    def __init__(self, output, limit=1 << 16):
+        self.output = output
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.limit:
+            self.flush()
+
+    def gaps(self, count):
+        while count > 0:
+            tokens = min(count, self.GAP_TOKENS)
+            self.write(self.GAP_CHUNK[:2 * tokens])
+            count -= tokens
+
+    def flush(self):
+        if self.parts:
+            self.output.write(''.join(self.parts))
+            self.parts = []
+            self.size = 0
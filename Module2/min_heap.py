@@ -1,5 +1,16 @@
-import sys
+import asyncio
+import io
+import os
+import random
 import re
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+
+from level_writer import LevelWriter
+from wal import DurableState, OP_ADD, OP_DELETE, OP_SET
 
 
 class MinHeapException(Exception):
@@ -7,82 +18,241 @@ class MinHeapException(Exception):
 
 
 class Node:
+    __slots__ = ('key', 'value')
+
     def __init__(self, key=None, value=None):
         self.key = key
         self.value = value
 
 
+SERVICE_READ_SIZE = 1 << 16
+USAGE = 'usage: min_heap.py [wal DIR] [serve PATH] [arity [double]] | bench [N] | bench-service'
+
+
 class MinHeap:
-    def __init__(self):
+    # arity - число потомков у узла. При d = 4 или 8 дерево ниже, и просеивание вверх
+    # (add_node, del_node) обновляет меньше позиций в heap_indices.
+    # double_ended - режим с парной max-кучей по тем же узлам: max() за O(1),
+    # extract_max() за O(log n). nodes_list и heap_indices при этом не меняются.
+    def __init__(self, arity=2, double_ended=False):
+        if arity < 2:
+            raise MinHeapException('error')
+
+        self.arity = arity
         self.nodes_list = list()
         self.heap_indices = dict()
+        self.double_ended = double_ended
+        self.max_list = list()
+        self.max_indices = dict()
+
+    # Построение кучи за O(n) (алгоритм Флойда). Просеивание идёт по отдельному списку ключей,
+    # а heap_indices заполняется один раз в конце.
+    @classmethod
+    def from_items(cls, items, arity=2, double_ended=False):
+        if arity < 2:
+            raise MinHeapException('error')
+
+        nodes = [Node(key, value) for key, value in items]
+        keys = [node.key for node in nodes]
+        size = len(nodes)
+
+        if None in keys or len(set(keys)) != size or any(node.value is None for node in nodes):
+            raise MinHeapException('error')
+
+        for start in range((size - 2) // arity, -1, -1):
+            idx = start
+            key = keys[idx]
+            node = nodes[idx]
+
+            while True:
+                first = arity * idx + 1
+                if first >= size:
+                    break
+
+                child_idx = first
+                for curr_idx in range(first + 1, min(first + arity, size)):
+                    if keys[curr_idx] < keys[child_idx]:
+                        child_idx = curr_idx
+
+                if keys[child_idx] >= key:
+                    break
+
+                keys[idx] = keys[child_idx]
+                nodes[idx] = nodes[child_idx]
+                idx = child_idx
+
+            keys[idx] = key
+            nodes[idx] = node
+
+        heap = cls(arity, double_ended)
+        heap.nodes_list = nodes
+        heap.heap_indices = {key: idx for idx, key in enumerate(keys)}
 
+        if double_ended:
+            heap.max_list = list(nodes)
+            heap.max_indices = dict(heap.heap_indices)
+            for start in range((size - 2) // arity, -1, -1):
+                cls.max_sift_down(heap.max_indices, heap.max_list, start, arity)
+
+        return heap
+
+    # Просеивания не меняют узлы местами: перемещаемый узел записывается один раз в конечную позицию.
     @staticmethod
-    def sift_up(indices, arr, idx):
-        if idx != 0:
-            parent_idx = (idx - 1) // 2
-            if arr[idx].key < arr[parent_idx].key:
-                indices[arr[idx].key] = parent_idx
-                indices[arr[parent_idx].key] = idx
+    def sift_up(indices, arr, idx, arity=2):
+        node = arr[idx]
+        key = node.key
+
+        while idx != 0:
+            parent_idx = (idx - 1) // arity
+            parent = arr[parent_idx]
+            if key >= parent.key:
+                break
+
+            arr[idx] = parent
+            indices[parent.key] = idx
+            idx = parent_idx
 
-                arr[idx], arr[parent_idx] = arr[parent_idx], arr[idx]
-                MinHeap.sift_up(indices, arr, parent_idx)
+        arr[idx] = node
+        indices[key] = idx
 
     @staticmethod
-    def sift_down(indices, arr, idx):
-        min_idx = idx
-        left_idx = 2 * idx + 1
-        right_idx = 2 * idx + 2
+    def sift_down(indices, arr, idx, arity=2):
+        size = len(arr)
+        node = arr[idx]
+        key = node.key
 
-        if left_idx < len(arr) and arr[left_idx].key < arr[min_idx].key:
-            min_idx = left_idx
+        while True:
+            first = arity * idx + 1
+            if first >= size:
+                break
 
-        if right_idx < len(arr) and arr[right_idx].key < arr[min_idx].key:
-            min_idx = right_idx
+            min_idx = first
+            child = arr[first]
+            for curr_idx in range(first + 1, min(first + arity, size)):
+                if arr[curr_idx].key < child.key:
+                    min_idx = curr_idx
+                    child = arr[curr_idx]
 
-        if min_idx != idx:
-            indices[arr[idx].key] = min_idx
-            indices[arr[min_idx].key] = idx
+            if child.key >= key:
+                break
 
-            arr[idx], arr[min_idx] = arr[min_idx], arr[idx]
-            MinHeap.sift_down(indices, arr, min_idx)
+            arr[idx] = child
+            indices[child.key] = idx
+            idx = min_idx
+
+        arr[idx] = node
+        indices[key] = idx
+
+    # Зеркальные просеивания для парной max-кучи.
+    @staticmethod
+    def max_sift_up(indices, arr, idx, arity=2):
+        node = arr[idx]
+        key = node.key
+
+        while idx != 0:
+            parent_idx = (idx - 1) // arity
+            parent = arr[parent_idx]
+            if key <= parent.key:
+                break
+
+            arr[idx] = parent
+            indices[parent.key] = idx
+            idx = parent_idx
+
+        arr[idx] = node
+        indices[key] = idx
+
+    @staticmethod
+    def max_sift_down(indices, arr, idx, arity=2):
+        size = len(arr)
+        node = arr[idx]
+        key = node.key
+
+        while True:
+            first = arity * idx + 1
+            if first >= size:
+                break
+
+            max_idx = first
+            child = arr[first]
+            for curr_idx in range(first + 1, min(first + arity, size)):
+                if arr[curr_idx].key > child.key:
+                    max_idx = curr_idx
+                    child = arr[curr_idx]
+
+            if child.key <= key:
+                break
+
+            arr[idx] = child
+            indices[child.key] = idx
+            idx = max_idx
+
+        arr[idx] = node
+        indices[key] = idx
+
+    def max_add(self, node):
+        self.max_list.append(node)
+        self.max_sift_up(self.max_indices, self.max_list, len(self.max_list) - 1, self.arity)
+
+    def max_remove(self, key):
+        idx = self.max_indices.pop(key)
+        last = self.max_list.pop()
+
+        if idx == len(self.max_list):
+            return
+
+        self.max_list[idx] = last
+        self.max_indices[last.key] = idx
+
+        if idx and last.key > self.max_list[(idx - 1) // self.arity].key:
+            self.max_sift_up(self.max_indices, self.max_list, idx, self.arity)
+        else:
+            self.max_sift_down(self.max_indices, self.max_list, idx, self.arity)
 
     def print(self, output):
-        if self.heap_size() == 0:
+        size = self.heap_size()
+        if size == 0:
             output.write('_\n')
             return
 
-        output.write(f'[{self.nodes_list[0].key} {self.nodes_list[0].value}]\n')
+        nodes = self.nodes_list
+        arity = self.arity
+        writer = LevelWriter(output)
 
-        if self.heap_size() == 1:
-            return
+        writer.write(f'[{nodes[0].key} {nodes[0].value}]\n')
 
-        layer = 1
         curr_idx = 1
+        width = arity
 
-        while True:
-            width = 2 ** layer
-
-            for node in range(width):
-                if node + curr_idx > self.heap_size() - 1:
-                    output.write('_ ' * (width - node - 1))
-                    output.write('_')
-                    break
+        while curr_idx < size:
+            end = min(curr_idx + width, size)
+            gaps = curr_idx + width - end
 
-                parent = ((curr_idx + node) - 1) // 2
-                output.write(f'[{self.nodes_list[curr_idx + node].key} '
-                             f'{self.nodes_list[curr_idx + node].value} '
-                             f'{self.nodes_list[parent].key}]')
+            for idx in range(curr_idx, end):
+                writer.write(f'[{nodes[idx].key} {nodes[idx].value} {nodes[(idx - 1) // arity].key}]')
+                if idx != end - 1 or gaps:
+                    writer.write(' ')
 
-                if node != width - 1:
-                    output.write(' ')
+            if gaps:
+                writer.gaps(gaps - 1)
+                writer.write('_')
 
-            output.write('\n')
+            writer.write('\n')
             curr_idx += width
-            layer += 1
+            width *= arity
 
-            if curr_idx > self.heap_size() - 1:
-                break
+        writer.flush()
+
+    # Компактный формат для больших куч: по строке на узел в порядке массива, "ключ значение родитель".
+    def dump(self, output):
+        nodes = self.nodes_list
+        writer = LevelWriter(output)
+
+        for idx, node in enumerate(nodes):
+            parent = nodes[(idx - 1) // self.arity].key if idx else '_'
+            writer.write(f'{node.key} {node.value} {parent}\n')
+
+        writer.flush()
 
     def heap_size(self):
         return len(self.nodes_list)
@@ -91,13 +261,18 @@ class MinHeap:
         if key is None or value is None or key in self.heap_indices:
             raise MinHeapException('error')
 
+        node = Node(key, value)
+
         if not self.nodes_list:
-            self.nodes_list.append(Node(key, value))
+            self.nodes_list.append(node)
             self.heap_indices[key] = 0
         else:
-            self.nodes_list.append(Node(key, value))
+            self.nodes_list.append(node)
             self.heap_indices[key] = self.heap_size() - 1
-            self.sift_up(self.heap_indices, self.nodes_list, self.heap_size() - 1)
+            self.sift_up(self.heap_indices, self.nodes_list, self.heap_size() - 1, self.arity)
+
+        if self.double_ended:
+            self.max_add(node)
 
     def set_node(self, key=None, value=None):
         if key is None or value is None or key not in self.heap_indices:
@@ -113,28 +288,34 @@ class MinHeap:
         size = self.heap_size()
         idx = self.heap_indices[key]
 
+        if self.double_ended:
+            self.max_remove(key)
+
         if size > 1 and idx < size - 1:
             del self.heap_indices[key]
             self.heap_indices[self.nodes_list[-1].key] = idx
             self.nodes_list[idx] = self.nodes_list[-1]
             self.nodes_list.pop()
 
-            parent_idx = (idx - 1) // 2
+            parent_idx = (idx - 1) // self.arity
 
             if not idx or self.nodes_list[idx].key > self.nodes_list[parent_idx].key:
-                MinHeap.sift_down(self.heap_indices, self.nodes_list, idx)
+                MinHeap.sift_down(self.heap_indices, self.nodes_list, idx, self.arity)
             else:
-                MinHeap.sift_up(self.heap_indices, self.nodes_list, idx)
+                MinHeap.sift_up(self.heap_indices, self.nodes_list, idx, self.arity)
         else:
             del self.heap_indices[key]
             self.nodes_list.pop()
 
     def extract_node(self):
         if not self.nodes_list:
-            raise Exception('error')
+            raise MinHeapException('error')
 
         node_to_extract = self.nodes_list[0]
 
+        if self.double_ended:
+            self.max_remove(node_to_extract.key)
+
         self.heap_indices.pop(self.nodes_list[0].key)
         self.nodes_list[0] = self.nodes_list[-1]
         self.nodes_list.pop()
@@ -143,7 +324,7 @@ class MinHeap:
             return node_to_extract
 
         self.heap_indices[self.nodes_list[0].key] = 0
-        self.sift_down(self.heap_indices, self.nodes_list, 0)
+        self.sift_down(self.heap_indices, self.nodes_list, 0, self.arity)
 
         return node_to_extract
 
@@ -166,60 +347,345 @@ class MinHeap:
         if not self.nodes_list:
             raise MinHeapException('error')
 
+        if self.double_ended:
+            return self.max_list[0]
+
         max_node = self.nodes_list[0]
         nodes_count = self.heap_size()
 
-        for curr_idx in range(nodes_count // 2, nodes_count):
+        # Листья начинаются сразу после родителя последнего узла.
+        for curr_idx in range((nodes_count + self.arity - 2) // self.arity, nodes_count):
             if self.nodes_list[curr_idx].key > max_node.key:
                 max_node = self.nodes_list[curr_idx]
 
         return max_node
 
+    def extract_max(self):
+        max_node = self.max()
+        self.del_node(max_node.key)
 
-if __name__ == '__main__':
-    min_heap = MinHeap()
-    output = sys.stdout
+        return max_node
 
-    for line in sys.stdin:
-        if line == '\n':
-            continue
-        try:
-            line = line[:-1]
-            cmd = line.split(' ')
 
-            if re.match(re.compile(r'(add -?\d+ \S*$)'), line):
-                min_heap.add_node(int(cmd[1]), cmd[2])
+# Куча, переживающая перезапуск (см. wal.DurableState): журнал heap.wal и снимок heap.snapshot
+# с узлами в порядке массива, так что from_items при восстановлении их не переставляет.
+class DurableMinHeap(DurableState):
+    NAME = 'heap'
+    WAL_MAGIC = b'HEAPWAL1'
+    SNAPSHOT_MAGIC = b'HEAPSNP1'
+    error = MinHeapException
 
-            elif re.match(re.compile(r'(set -?\d+ \S*$)'), line):
-                min_heap.set_node(int(cmd[1]), cmd[2])
+    def __init__(self, directory, arity=2, double_ended=False, group_size=64, snapshot_every=1 << 20):
+        self.arity = arity
+        self.double_ended = double_ended
+        super().__init__(directory, group_size, snapshot_every)
 
-            elif re.match(re.compile(r'(delete -?\d+$)'), line):
-                min_heap.del_node(int(cmd[1]))
+    def load(self, items):
+        self.heap = MinHeap.from_items(items, self.arity, self.double_ended)
 
-            elif re.match(re.compile(r'(search -?\d+$)'), line):
-                idx = min_heap.search_node(int(cmd[1]))
-                if idx is not None:
-                    print(f'1 {idx} {min_heap.nodes_list[idx].value}')
-                else:
-                    print('0')
+    def items(self):
+        return ((node.key, node.value) for node in self.heap.nodes_list)
 
-            elif re.match(re.compile(r'(extract)$'), line):
-                extracted_node = min_heap.extract_node()
-                print(f'{extracted_node.key} {extracted_node.value}')
+    def apply(self, op, key, value):
+        if op == OP_ADD:
+            self.heap.add_node(key, value)
+        elif op == OP_SET:
+            self.heap.set_node(key, value)
+        else:
+            self.heap.del_node(key)
+
+    def add_node(self, key=None, value=None):
+        record = self.record(OP_ADD, key, value)
+        self.heap.add_node(key, value)
+        self.logged(record)
+
+    def set_node(self, key=None, value=None):
+        record = self.record(OP_SET, key, value)
+        self.heap.set_node(key, value)
+        self.logged(record)
+
+    def del_node(self, key=None):
+        record = self.record(OP_DELETE, key)
+        self.heap.del_node(key)
+        self.logged(record)
 
-            elif re.match(re.compile(r'(min)$'), line):
-                min_node = min_heap.min()
-                print(f'{min_node.key} {min_heap.heap_indices[min_node.key]} {min_node.value}')
+    def extract_node(self):
+        record = self.record(OP_DELETE, self.heap.min().key)
+        node = self.heap.extract_node()
+        self.logged(record)
+        return node
+
+    def extract_max(self):
+        record = self.record(OP_DELETE, self.heap.max().key)
+        node = self.heap.extract_max()
+        self.logged(record)
+        return node
 
-            elif re.match(re.compile(r'(max)$'), line):
-                max_node = min_heap.max()
-                print(f'{max_node.key} {min_heap.heap_indices[max_node.key]} {max_node.value}')
+    @property
+    def nodes_list(self):
+        return self.heap.nodes_list
 
-            elif re.match(re.compile(r'(print)$'), line):
-                min_heap.print(output)
+    @property
+    def heap_indices(self):
+        return self.heap.heap_indices
+
+    def heap_size(self):
+        return self.heap.heap_size()
 
+    def search_node(self, key):
+        return self.heap.search_node(key)
+
+    def min(self):
+        return self.heap.min()
+
+    def max(self):
+        return self.heap.max()
+
+    def print(self, output):
+        self.heap.print(output)
+
+    def dump(self, output):
+        self.heap.dump(output)
+
+
+# Выполняет одну команду текстового протокола; ответ (если он есть) пишется в output.
+def execute_command(min_heap, line, output):
+    cmd = line.split(' ')
+
+    try:
+        if re.match(re.compile(r'(add -?\d+ \S*$)'), line):
+            min_heap.add_node(int(cmd[1]), cmd[2])
+
+        elif re.match(re.compile(r'(set -?\d+ \S*$)'), line):
+            min_heap.set_node(int(cmd[1]), cmd[2])
+
+        elif re.match(re.compile(r'(delete -?\d+$)'), line):
+            min_heap.del_node(int(cmd[1]))
+
+        elif re.match(re.compile(r'(search -?\d+$)'), line):
+            idx = min_heap.search_node(int(cmd[1]))
+            if idx is not None:
+                output.write(f'1 {idx} {min_heap.nodes_list[idx].value}\n')
             else:
-                print('error')
+                output.write('0\n')
+
+        elif re.match(re.compile(r'(extract)$'), line):
+            extracted_node = min_heap.extract_node()
+            output.write(f'{extracted_node.key} {extracted_node.value}\n')
+
+        elif re.match(re.compile(r'(min)$'), line):
+            min_node = min_heap.min()
+            output.write(f'{min_node.key} {min_heap.heap_indices[min_node.key]} {min_node.value}\n')
+
+        elif re.match(re.compile(r'(max)$'), line):
+            max_node = min_heap.max()
+            output.write(f'{max_node.key} {min_heap.heap_indices[max_node.key]} {max_node.value}\n')
 
-        except MinHeapException as mh_error:
-            print(mh_error)
\ No newline at end of file
+        elif re.match(re.compile(r'(print)$'), line):
+            min_heap.print(output)
+
+        elif re.match(re.compile(r'(dump)$'), line):
+            min_heap.dump(output)
+
+        else:
+            output.write('error\n')
+
+    except MinHeapException as mh_error:
+        output.write(f'{mh_error}\n')
+
+
+# Клиент сервиса. Всё, что пришло к моменту чтения, выполняется одной пачкой без переключений
+# цикла событий (поэтому кучу не нужно защищать), ответы уходят одной записью.
+async def handle_client(min_heap, reader, writer):
+    pending = b''
+
+    try:
+        while True:
+            data = await reader.read(SERVICE_READ_SIZE)
+            if not data:
+                break
+
+            lines = (pending + data).split(b'\n')
+            pending = lines.pop()
+            output = io.StringIO()
+
+            for line in lines:
+                if not line:
+                    continue
+                try:
+                    line = line.decode()
+                except UnicodeDecodeError:
+                    # Строка не в UTF-8 - ошибка только этой команды, пачка выполняется дальше.
+                    output.write('error\n')
+                    continue
+                execute_command(min_heap, line, output)
+
+            # Ответ уходит только после фиксации журнала всей пачки.
+            if isinstance(min_heap, DurableMinHeap):
+                min_heap.commit()
+
+            writer.write(output.getvalue().encode())
+            await writer.drain()
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def serve(path, min_heap):
+    if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+        os.unlink(path)
+
+    server = await asyncio.start_unix_server(
+        lambda reader, writer: handle_client(min_heap, reader, writer), path=path)
+
+    async with server:
+        await server.serve_forever()
+
+
+# Выбор arity: Дейкстра на случайном графе из vertices вершин и 5 * vertices рёбер для d = 2, 4, 8.
+# Ключ кучи - расстояние * vertices + вершина (ключи уникальны), уменьшение ключа - del_node + add_node.
+def bench(out=sys.stdout, vertices=200000, seed=1):
+    rng = random.Random(seed)
+    graph = [list() for _ in range(vertices)]
+    for _ in range(5 * vertices):
+        graph[rng.randrange(vertices)].append((rng.randrange(vertices), rng.randint(1, 1000)))
+
+    for arity in (2, 4, 8):
+        min_heap = MinHeap(arity)
+        dist = [None] * vertices
+        done = [False] * vertices
+        decreases = 0
+
+        start = time.perf_counter()
+        dist[0] = 0
+        min_heap.add_node(0, 0)
+
+        while min_heap.heap_size():
+            vertex = min_heap.extract_node().value
+            done[vertex] = True
+
+            for target, weight in graph[vertex]:
+                new_dist = dist[vertex] + weight
+                if done[target] or dist[target] is not None and dist[target] <= new_dist:
+                    continue
+
+                if dist[target] is not None:
+                    min_heap.del_node(dist[target] * vertices + target)
+                    decreases += 1
+                dist[target] = new_dist
+                min_heap.add_node(new_dist * vertices + target, target)
+
+        elapsed = time.perf_counter() - start
+        out.write(f'd={arity}: {elapsed:.3f}s, {decreases} decrease-key\n')
+
+
+# Клиент нагрузочного теста: rounds раз отправляет pipeline команд add и один search,
+# время ответа на search - задержка раунда.
+async def bench_client(path, client_id, rounds, pipeline, latencies):
+    reader, writer = await asyncio.open_unix_connection(path)
+    base = client_id * rounds * pipeline
+
+    for round_idx in range(rounds):
+        first = base + round_idx * pipeline
+        batch = ''.join(f'add {key} v\n' for key in range(first, first + pipeline)) + f'search {first}\n'
+
+        start = time.perf_counter()
+        writer.write(batch.encode())
+        await writer.drain()
+        await reader.readline()
+        latencies.append(time.perf_counter() - start)
+
+    writer.close()
+    await writer.wait_closed()
+
+
+# Задержка и пропускная способность сервиса: для каждой пары (клиенты, pipeline) запускается
+# отдельный процесс "serve" на временном сокете.
+def bench_service(out=sys.stdout, rounds=256):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'heap.sock')
+
+        for clients, pipeline in ((1, 1), (64, 1), (64, 64), (256, 16)):
+            server = subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve', path])
+            try:
+                while not os.path.exists(path):
+                    time.sleep(0.01)
+
+                latencies = list()
+
+                async def run_clients():
+                    await asyncio.gather(*(bench_client(path, client_id, rounds, pipeline, latencies)
+                                           for client_id in range(clients)))
+
+                start = time.perf_counter()
+                asyncio.run(run_clients())
+                elapsed = time.perf_counter() - start
+            finally:
+                server.kill()
+                server.wait()
+                if os.path.exists(path):
+                    os.unlink(path)
+
+            latencies.sort()
+            commands = clients * rounds * (pipeline + 1)
+            out.write(f'clients={clients} pipeline={pipeline}: {commands / elapsed:.0f} cmd/s, '
+                      f'p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, '
+                      f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms\n')
+
+
+if __name__ == '__main__':
+    # Режимы: "min_heap.py [arity [double]]" - фильтр stdin -> stdout;
+    # "min_heap.py serve PATH [arity [double]]" - сервис на Unix-сокете PATH с тем же протоколом.
+    # Перед ними можно указать "wal DIR": состояние восстанавливается из DIR и журналируется туда.
+    # "min_heap.py bench [N]" - Дейкстра на графе из N вершин для d = 2, 4, 8;
+    # "min_heap.py bench-service" - нагрузочный тест сервиса с параллельными клиентами.
+    args = sys.argv[1:]
+    if args == ['bench-service']:
+        bench_service()
+        sys.exit()
+
+    if args and args[0] == 'bench':
+        if len(args) > 2 or args[1:] and (not args[1].isdecimal() or int(args[1]) < 1):
+            sys.exit(USAGE)
+        bench(vertices=int(args[1]) if len(args) > 1 else 200000)
+        sys.exit()
+
+    wal_dir = None
+    if args and args[0] == 'wal':
+        if len(args) < 2:
+            sys.exit(USAGE)
+        wal_dir = args[1]
+        args = args[2:]
+
+    socket_path = None
+    if args and args[0] == 'serve':
+        if len(args) < 2:
+            sys.exit(USAGE)
+        socket_path = args[1]
+        args = args[2:]
+
+    if args and (not args[0].isdecimal() or int(args[0]) < 2 or args[1:] not in ([], ['double'])):
+        sys.exit(USAGE)
+
+    arity = int(args[0]) if args else 2
+    double_ended = args[1:] == ['double']
+
+    if wal_dir is not None:
+        min_heap = DurableMinHeap(wal_dir, arity, double_ended)
+    else:
+        min_heap = MinHeap(arity, double_ended)
+
+    try:
+        if socket_path is not None:
+            asyncio.run(serve(socket_path, min_heap))
+            sys.exit()
+
+        output = sys.stdout
+
+        for line in sys.stdin:
+            if line == '\n':
+                continue
+            execute_command(min_heap, line[:-1], output)
+    finally:
+        if wal_dir is not None:
+            min_heap.close()
@@ -1,8 +1,15 @@
+import random
 import re
 import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
 from collections import deque
+from contextlib import contextmanager
 
-sys.setrecursionlimit(10000)
+from level_writer import LevelWriter
+from wal import DurableState, OP_ADD, OP_BULK_DELETE, OP_DELETE, OP_SET
 
 
 class SplayTreeException(Exception):
@@ -10,9 +17,13 @@ class SplayTreeException(Exception):
 
 
 class Node:
+    __slots__ = ('key', 'value', 'parent', 'r_child', 'l_child', 'size')
+
     def __init__(self, key=None, value=None):
         self.key = key
         self.value = value
+        # Число узлов в поддереве с корнем в этом узле.
+        self.size = 1
 
         self.parent = None
         self.r_child = None
@@ -24,83 +35,159 @@ class Node:
     def has_left_child(self):
         return self.l_child is not None
 
+    def update_size(self):
+        self.size = 1 + (self.l_child.size if self.l_child is not None else 0) \
+            + (self.r_child.size if self.r_child is not None else 0)
+
+
+# Общий интерфейс упорядоченного словаря - команды драйвера. Движки: SplayTree, BTreeMap,
+# BlockedSortedList; ошибки (повторный add, отсутствующий ключ у set/delete, min/max пустого
+# словаря) - SplayTreeException('error'), search отсутствующего ключа возвращает None.
+class OrderedMap(ABC):
+    @abstractmethod
+    def add(self, key=None, value=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key, value):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    def minimum(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def maximum(self):
+        raise NotImplementedError
 
-class SplayTree:
+
+class SplayTree(OrderedMap):
     def __init__(self):
         self.root = None
 
+    # Сбалансированное дерево из пар (ключ, значение), отсортированных по возрастанию ключа, за O(n).
+    # Середина каждого отрезка становится корнем его поддерева; отрезки обходятся по стеку.
+    @classmethod
+    def from_sorted(cls, items):
+        nodes = [Node(key, value) for key, value in items]
+
+        for idx, node in enumerate(nodes):
+            if node.key is None or node.value is None or (idx and nodes[idx - 1].key >= node.key):
+                raise SplayTreeException('error')
+
+        tree = cls()
+        stack = [(0, len(nodes), None, False)] if nodes else []
+
+        while stack:
+            lo, hi, parent, is_left = stack.pop()
+            mid = (lo + hi) // 2
+            node = nodes[mid]
+            node.size = hi - lo
+            node.parent = parent
+
+            if parent is None:
+                tree.root = node
+            elif is_left:
+                parent.l_child = node
+            else:
+                parent.r_child = node
+
+            if lo < mid:
+                stack.append((lo, mid, node, True))
+            if mid + 1 < hi:
+                stack.append((mid + 1, hi, node, False))
+
+        return tree
+
+    # Уровни обходятся списками (узел, позиция); пропуски между узлами выводятся через LevelWriter.gaps
+    # и не собираются в одну строку.
     def print(self, out=sys.stdout):
         if self.root is None:
             out.write('_\n')
             return
 
-        height = self.height(self.root)
-        nodes_queue = deque()
-        pos_queue = deque()
-
-        out.write(f'[{self.root.key} {self.root.value}]\n')
+        writer = LevelWriter(out)
+        writer.write(f'[{self.root.key} {self.root.value}]\n')
 
-        if self.root.l_child is not None:
-            nodes_queue.append(self.root.l_child)
-            pos_queue.append(0)
+        layer = [(self.root, 0)]
+        width = 1
 
-        if self.root.r_child is not None:
-            nodes_queue.append(self.root.r_child)
-            pos_queue.append(1)
+        while True:
+            next_layer = []
+            for node, pos in layer:
+                if node.l_child is not None:
+                    next_layer.append((node.l_child, 2 * pos))
+                if node.r_child is not None:
+                    next_layer.append((node.r_child, 2 * pos + 1))
 
-        nums_of_nodes = len(pos_queue)
-
-        if nums_of_nodes == 0:
-            return
+            if not next_layer:
+                break
 
-        curr = pos_queue.popleft()
-
-        for layer in range(1, height):
+            layer = next_layer
+            width *= 2
             curr_pos = 0
-            layer_width = 2 ** layer
 
-            while nums_of_nodes != 0:
-                if curr_pos == curr:
-                    nums_of_nodes -= 1
-                    node = nodes_queue.popleft()
+            for node, pos in layer:
+                writer.gaps(pos - curr_pos)
+                writer.write(f'[{node.key} {node.value} {node.parent.key}]')
+                if pos != width - 1:
+                    writer.write(' ')
+                curr_pos = pos + 1
 
-                    if curr != layer_width - 1:
-                        out.write(f'[{node.key} {node.value} {node.parent.key}] ')
-                    else:
-                        out.write(f'[{node.key} {node.value} {node.parent.key}]')
+            if curr_pos != width:
+                writer.gaps(width - curr_pos - 1)
+                writer.write('_')
 
-                    if node.l_child is not None:
-                        nodes_queue.append(node.l_child)
-                        pos_queue.append(2 * (curr + 1) - 2)
+            writer.write('\n')
 
-                    if node.r_child is not None:
-                        nodes_queue.append(node.r_child)
-                        pos_queue.append(2 * (curr + 1) - 1)
+        writer.flush()
 
-                    curr_pos = curr + 1
+    # Компактный вывод: строка "ключ значение родитель" на каждый узел в порядке обхода в ширину.
+    def dump(self, out=sys.stdout):
+        writer = LevelWriter(out)
+        nodes_queue = deque()
 
-                    if len(pos_queue) != 0:
-                        curr = pos_queue.popleft()
+        if self.root is not None:
+            nodes_queue.append(self.root)
 
-                elif curr - curr_pos != 0:
-                    out.write('_ ' * (curr - curr_pos))
-                    curr_pos = curr
+        while nodes_queue:
+            node = nodes_queue.popleft()
+            parent = node.parent.key if node.parent is not None else '_'
+            writer.write(f'{node.key} {node.value} {parent}\n')
 
-                if nums_of_nodes == 0:
-                    out.write('_ ' * (layer_width - curr_pos - 1))
-                    if curr_pos != layer_width:
-                        out.write('_')
+            if node.l_child is not None:
+                nodes_queue.append(node.l_child)
+            if node.r_child is not None:
+                nodes_queue.append(node.r_child)
 
-            nums_of_nodes = len(pos_queue) + 1
-            out.write('\n')
+        writer.flush()
 
+    # Высота считается обходом по уровням, без рекурсии.
     def height(self, node):
-        if node is None:
-            return 0
-
-        return 1 + max(self.height(node.l_child), self.height(node.r_child))
-
-    def right_rotate(self, node=Node()):
+        height = 0
+        layer = [node] if node is not None else []
+
+        while layer:
+            height += 1
+            next_layer = []
+            for curr in layer:
+                if curr.l_child is not None:
+                    next_layer.append(curr.l_child)
+                if curr.r_child is not None:
+                    next_layer.append(curr.r_child)
+            layer = next_layer
+
+        return height
+
+    def right_rotate(self, node):
         left_child = node.l_child
         node.l_child = left_child.r_child
 
@@ -119,7 +206,10 @@ class SplayTree:
         left_child.r_child = node
         node.parent = left_child
 
-    def left_rotate(self, node=Node()):
+        node.update_size()
+        left_child.update_size()
+
+    def left_rotate(self, node):
         right_child = node.r_child
         node.r_child = right_child.l_child
 
@@ -138,28 +228,32 @@ class SplayTree:
         right_child.l_child = node
         node.parent = right_child
 
-    def splay(self, node=Node()):
+        node.update_size()
+        right_child.update_size()
+
+    def splay(self, node):
         if node is None:
             return
 
         while node.parent is not None:
-            if node.parent != self.root:
-                parent = node.parent
-                gr_parent = node.parent.parent
+            parent = node.parent
+            gr_parent = parent.parent
+            if gr_parent is not None:
+                is_left = parent.l_child is node
                 # zig-zig
-                if node.parent.l_child == node and parent.parent.l_child == parent:
+                if is_left and gr_parent.l_child is parent:
                     self.right_rotate(gr_parent)
                     self.right_rotate(parent)
                 # zig-zag
-                elif node.parent.l_child == node and parent.parent.r_child == parent:
+                elif is_left:
                     self.right_rotate(parent)
                     self.left_rotate(gr_parent)
                 # zag-zig
-                elif node.parent.r_child == node and parent.parent.l_child == parent:
+                elif gr_parent.l_child is parent:
                     self.left_rotate(parent)
                     self.right_rotate(gr_parent)
                 # zag-zag
-                elif node.parent.r_child == node and parent.parent.r_child == parent:
+                else:
                     self.left_rotate(gr_parent)
                     self.left_rotate(parent)
             else:
@@ -189,14 +283,18 @@ class SplayTree:
             node_to_add = parent_node.r_child = Node(key, value)
 
         node_to_add.parent = parent_node
+
+        while parent_node is not None:
+            parent_node.size += 1
+            parent_node = parent_node.parent
+
         self.splay(node_to_add)
 
     def delete(self, key):
         if key is None:
             raise SplayTreeException('error')
 
-        node_to_delete = SplayTree.find(self.root, key)
-        self.splay(node_to_delete)
+        node_to_delete = self.access(key)
 
         if node_to_delete is None or node_to_delete.key != key:
             raise SplayTreeException('error')
@@ -223,12 +321,13 @@ class SplayTree:
             if new_root.has_right_child():
                 new_root.r_child.parent = new_root
 
+            new_root.update_size()
+
     def search(self, key):
         if key is None:
             raise SplayTreeException('error')
 
-        node_to_search = SplayTree.find(self.root, key)
-        self.splay(node_to_search)
+        node_to_search = self.access(key)
 
         if not node_to_search or node_to_search.key != key:
             return None
@@ -239,8 +338,7 @@ class SplayTree:
         if key is None or value is None:
             raise SplayTreeException('error')
 
-        node_to_set = SplayTree.find(self.root, key)
-        self.splay(node_to_set)
+        node_to_set = self.access(key)
 
         if node_to_set is None or node_to_set.key != key:
             raise SplayTreeException('error')
@@ -271,8 +369,174 @@ class SplayTree:
 
         return min_node.key, min_node.value
 
+    # Поиск с подъёмом: последний узел на пути к key поднимается в корень и возвращается
+    # (None для пустого дерева).
+    def access(self, key):
+        node = self.root
+        if node is None:
+            return None
+
+        while True:
+            if key < node.key:
+                child = node.l_child
+            elif key > node.key:
+                child = node.r_child
+            else:
+                break
+
+            if child is None:
+                break
+            node = child
+
+        self.splay(node)
+        return node
+
+    def size(self):
+        return self.root.size if self.root is not None else 0
+
+    # Число ключей меньше key (с inclusive - не больше key). Последний узел пути поднимается в корень.
+    def count_less(self, key, inclusive=False):
+        if key is None:
+            raise SplayTreeException('error')
+
+        count = 0
+        last = None
+        node = self.root
+
+        while node is not None:
+            last = node
+            if key < node.key or (key == node.key and not inclusive):
+                node = node.l_child
+            else:
+                count += 1 + (node.l_child.size if node.l_child is not None else 0)
+                if key == node.key:
+                    break
+                node = node.r_child
+
+        self.splay(last)
+        return count
+
+    def rank(self, key):
+        return self.count_less(key)
+
+    # k-й по возрастанию ключ (с нуля).
+    def select(self, k):
+        if k is None or not 0 <= k < self.size():
+            raise SplayTreeException('error')
+
+        node = self.root
+        while True:
+            left_size = node.l_child.size if node.l_child is not None else 0
+            if k < left_size:
+                node = node.l_child
+            elif k > left_size:
+                k -= left_size + 1
+                node = node.r_child
+            else:
+                break
+
+        self.splay(node)
+        return node.key, node.value
+
+    # Ключи из [lo, hi] по возрастанию. lo сначала поднимается в корень, дальше walk идёт по стеку
+    # и дерево не перестраивает, поэтому менять дерево до конца обхода нельзя.
+    def range(self, lo, hi):
+        if lo is None or hi is None:
+            raise SplayTreeException('error')
+
+        self.access(lo)
+        yield from self.walk(lo, hi)
+
+    # Обход [lo, hi] без поворотов (None - без границы).
+    def walk(self, lo=None, hi=None):
+        stack = []
+        node = self.root
+
+        while True:
+            while node is not None:
+                if lo is not None and node.key < lo:
+                    node = node.r_child
+                else:
+                    stack.append(node)
+                    node = node.l_child
+
+            if not stack:
+                return
+            node = stack.pop()
+            if hi is not None and node.key > hi:
+                return
+            yield node.key, node.value
+            node = node.r_child
+
+    def count(self, lo, hi):
+        if lo is None or hi is None:
+            raise SplayTreeException('error')
+        if lo > hi:
+            return 0
+
+        return self.count_less(hi, inclusive=True) - self.count_less(lo)
+
+    # Отделяет в новое дерево ключи >= key (при inclusive=False - ключи > key), остальные остаются.
+    def split(self, key, inclusive=True):
+        if key is None:
+            raise SplayTreeException('error')
+
+        other = SplayTree()
+        node = self.access(key)
+
+        if node is None:
+            return other
+
+        if node.key > key or (inclusive and node.key == key):
+            self.root = node.l_child
+            node.l_child = None
+            other.root = node
+        else:
+            other.root = node.r_child
+            node.r_child = None
+
+        node.update_size()
+        if self.root is not None:
+            self.root.parent = None
+        if other.root is not None:
+            other.root.parent = None
+
+        return other
+
+    # Присоединяет other, все ключи которого больше ключей этого дерева; other становится пустым.
+    def join(self, other):
+        if other.root is None:
+            return
+
+        if self.root is None:
+            self.root, other.root = other.root, None
+            return
+
+        max_key, _ = self.maximum()
+        min_key, _ = other.minimum()
+        if max_key >= min_key:
+            raise SplayTreeException('error')
+
+        self.root.r_child = other.root
+        other.root.parent = self.root
+        self.root.update_size()
+        other.root = None
+
+    # Удаляет все ключи из [lo, hi] двумя split и одним join; возвращает число удалённых узлов.
+    def bulk_delete(self, lo, hi):
+        if lo is None or hi is None:
+            raise SplayTreeException('error')
+        if lo > hi:
+            return 0
+
+        middle = self.split(lo)
+        tail = middle.split(hi, inclusive=False)
+        self.join(tail)
+
+        return middle.size()
+
     @staticmethod
-    def find(root=Node(), key=None):
+    def find(root, key):
         if root is None:
             return None
 
@@ -291,43 +555,691 @@ class SplayTree:
         return prev_node
 
 
-if __name__ == '__main__':
-    splay_tree = SplayTree()
+class BTreeNode:
+    __slots__ = ('keys', 'values', 'children')
 
-    for line in sys.stdin:
-        if line == '\n':
-            continue
-        try:
-            line = line[:-1]
-            cmd = line.split(' ')
+    def __init__(self, keys=None, values=None, children=None):
+        self.keys = keys if keys is not None else []
+        self.values = values if values is not None else []
+        # Пустой список у листа.
+        self.children = children if children is not None else []
+
+
+# B-дерево минимальной степени degree: в узле от degree - 1 до 2 * degree - 1 ключей,
+# ключи и значения лежат в параллельных списках узла. Вставка и удаление однопроходные:
+# переполненные узлы делятся, а узлы с минимумом ключей пополняются ещё на спуске.
+class BTreeMap(OrderedMap):
+    def __init__(self, degree=32):
+        if degree < 2:
+            raise SplayTreeException('error')
+
+        self.degree = degree
+        self.root = None
+
+    def find_node(self, key):
+        node = self.root
+
+        while node is not None:
+            idx = bisect_left(node.keys, key)
+            if idx < len(node.keys) and node.keys[idx] == key:
+                return node, idx
+            if not node.children:
+                break
+            node = node.children[idx]
+
+        return None, -1
+
+    def split_child(self, parent, idx):
+        child = parent.children[idx]
+        mid = self.degree - 1
+
+        right = BTreeNode(child.keys[mid + 1:], child.values[mid + 1:], child.children[mid + 1:])
+        parent.keys.insert(idx, child.keys[mid])
+        parent.values.insert(idx, child.values[mid])
+        parent.children.insert(idx + 1, right)
+
+        del child.keys[mid:]
+        del child.values[mid:]
+        del child.children[mid + 1:]
+
+    # Сливает children[idx], ключ idx и children[idx + 1] в один узел.
+    @staticmethod
+    def merge_children(node, idx):
+        left = node.children[idx]
+        right = node.children.pop(idx + 1)
+
+        left.keys.append(node.keys.pop(idx))
+        left.values.append(node.values.pop(idx))
+        left.keys.extend(right.keys)
+        left.values.extend(right.values)
+        left.children.extend(right.children)
+
+    # Доводит children[idx] до degree ключей перед спуском в него; возвращает индекс ребёнка,
+    # который после слияния может сдвинуться на единицу влево.
+    def fill_child(self, node, idx):
+        child = node.children[idx]
+
+        if idx > 0 and len(node.children[idx - 1].keys) >= self.degree:
+            left = node.children[idx - 1]
+            child.keys.insert(0, node.keys[idx - 1])
+            child.values.insert(0, node.values[idx - 1])
+            node.keys[idx - 1] = left.keys.pop()
+            node.values[idx - 1] = left.values.pop()
+            if left.children:
+                child.children.insert(0, left.children.pop())
+
+        elif idx + 1 < len(node.children) and len(node.children[idx + 1].keys) >= self.degree:
+            right = node.children[idx + 1]
+            child.keys.append(node.keys[idx])
+            child.values.append(node.values[idx])
+            node.keys[idx] = right.keys.pop(0)
+            node.values[idx] = right.values.pop(0)
+            if right.children:
+                child.children.append(right.children.pop(0))
+
+        elif idx + 1 < len(node.children):
+            self.merge_children(node, idx)
 
-            if re.match(re.compile(r'(add -?\d+ \S*$)'), line):
-                splay_tree.add(int(cmd[1]), cmd[2])
+        else:
+            self.merge_children(node, idx - 1)
+            idx -= 1
+
+        return idx
+
+    def add(self, key=None, value=None):
+        if key is None or value is None:
+            raise SplayTreeException('error')
+
+        if self.root is None:
+            self.root = BTreeNode([key], [value])
+            return
 
-            elif re.match(re.compile(r'(set -?\d+ \S*$)'), line):
-                splay_tree.set(int(cmd[1]), cmd[2])
+        full = 2 * self.degree - 1
 
-            elif re.match(re.compile(r'(delete -?\d+$)'), line):
-                splay_tree.delete(int(cmd[1]))
+        if len(self.root.keys) == full:
+            self.root = BTreeNode(children=[self.root])
+            self.split_child(self.root, 0)
 
-            elif re.match(re.compile(r'(search -?\d+$)'), line):
-                value = splay_tree.search(int(cmd[1]))
-                if value is not None:
-                    print(f'1 {value}')
+        node = self.root
+
+        while True:
+            idx = bisect_left(node.keys, key)
+            if idx < len(node.keys) and node.keys[idx] == key:
+                raise SplayTreeException('error')
+
+            if not node.children:
+                node.keys.insert(idx, key)
+                node.values.insert(idx, value)
+                return
+
+            if len(node.children[idx].keys) == full:
+                self.split_child(node, idx)
+                if node.keys[idx] == key:
+                    raise SplayTreeException('error')
+                if node.keys[idx] < key:
+                    idx += 1
+
+            node = node.children[idx]
+
+    def delete(self, key):
+        if key is None or self.root is None:
+            raise SplayTreeException('error')
+
+        node = self.root
+        found = False
+
+        while True:
+            idx = bisect_left(node.keys, key)
+            in_node = idx < len(node.keys) and node.keys[idx] == key
+
+            if not node.children:
+                if in_node:
+                    del node.keys[idx]
+                    del node.values[idx]
+                    found = True
+                break
+
+            if in_node:
+                left, right = node.children[idx], node.children[idx + 1]
+
+                # Ключ внутреннего узла заменяется предшественником или преемником,
+                # после чего удаляется уже он.
+                if len(left.keys) >= self.degree:
+                    pred = left
+                    while pred.children:
+                        pred = pred.children[-1]
+                    key = node.keys[idx] = pred.keys[-1]
+                    node.values[idx] = pred.values[-1]
+                    node = left
+                elif len(right.keys) >= self.degree:
+                    succ = right
+                    while succ.children:
+                        succ = succ.children[0]
+                    key = node.keys[idx] = succ.keys[0]
+                    node.values[idx] = succ.values[0]
+                    node = right
                 else:
-                    print('0')
+                    self.merge_children(node, idx)
+                    node = left
+                continue
 
-            elif re.match(re.compile(r'(min)$'), line):
-                key, value = splay_tree.minimum()
-                print(f'{key} {value}')
+            if len(node.children[idx].keys) < self.degree:
+                idx = self.fill_child(node, idx)
+            node = node.children[idx]
 
-            elif re.match(re.compile(r'(max)$'), line):
-                key, value = splay_tree.maximum()
-                print(f'{key} {value}')
+        if not self.root.keys:
+            self.root = self.root.children[0] if self.root.children else None
 
-            elif re.match(re.compile(r'(print)$'), line):
-                splay_tree.print()
-            else:
-                print("error")
-        except SplayTreeException as st_error:
-            print(st_error)
\ No newline at end of file
+        if not found:
+            raise SplayTreeException('error')
+
+    def search(self, key):
+        if key is None:
+            raise SplayTreeException('error')
+
+        node, idx = self.find_node(key)
+        return node.values[idx] if node is not None else None
+
+    def set(self, key, value):
+        if key is None or value is None:
+            raise SplayTreeException('error')
+
+        node, idx = self.find_node(key)
+        if node is None:
+            raise SplayTreeException('error')
+
+        node.values[idx] = value
+
+    def maximum(self):
+        if self.root is None:
+            raise SplayTreeException('error')
+
+        node = self.root
+        while node.children:
+            node = node.children[-1]
+
+        return node.keys[-1], node.values[-1]
+
+    def minimum(self):
+        if self.root is None:
+            raise SplayTreeException('error')
+
+        node = self.root
+        while node.children:
+            node = node.children[0]
+
+        return node.keys[0], node.values[0]
+
+
+# Отсортированный список, разбитый на блоки не длиннее 2 * load; maxes хранит последний ключ
+# каждого блока, так что поиск - два bisect, а вставка сдвигает только один короткий блок.
+class BlockedSortedList(OrderedMap):
+    def __init__(self, load=512):
+        if load < 1:
+            raise SplayTreeException('error')
+
+        self.load = load
+        self.key_blocks = []
+        self.value_blocks = []
+        self.maxes = []
+
+    def locate(self, key):
+        block_idx = bisect_left(self.maxes, key)
+        if block_idx == len(self.maxes):
+            return block_idx, -1
+
+        idx = bisect_left(self.key_blocks[block_idx], key)
+        if self.key_blocks[block_idx][idx] != key:
+            return block_idx, -1
+
+        return block_idx, idx
+
+    def add(self, key=None, value=None):
+        if key is None or value is None:
+            raise SplayTreeException('error')
+
+        if not self.maxes:
+            self.key_blocks.append([key])
+            self.value_blocks.append([value])
+            self.maxes.append(key)
+            return
+
+        block_idx = min(bisect_left(self.maxes, key), len(self.maxes) - 1)
+        keys = self.key_blocks[block_idx]
+        values = self.value_blocks[block_idx]
+
+        idx = bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            raise SplayTreeException('error')
+
+        keys.insert(idx, key)
+        values.insert(idx, value)
+        self.maxes[block_idx] = keys[-1]
+
+        if len(keys) > 2 * self.load:
+            self.key_blocks[block_idx:block_idx + 1] = [keys[:self.load], keys[self.load:]]
+            self.value_blocks[block_idx:block_idx + 1] = [values[:self.load], values[self.load:]]
+            self.maxes.insert(block_idx, keys[self.load - 1])
+
+    def delete(self, key):
+        if key is None:
+            raise SplayTreeException('error')
+
+        block_idx, idx = self.locate(key)
+        if idx < 0:
+            raise SplayTreeException('error')
+
+        keys = self.key_blocks[block_idx]
+        del keys[idx]
+        del self.value_blocks[block_idx][idx]
+
+        if keys:
+            self.maxes[block_idx] = keys[-1]
+        else:
+            del self.key_blocks[block_idx]
+            del self.value_blocks[block_idx]
+            del self.maxes[block_idx]
+
+    def search(self, key):
+        if key is None:
+            raise SplayTreeException('error')
+
+        block_idx, idx = self.locate(key)
+        return self.value_blocks[block_idx][idx] if idx >= 0 else None
+
+    def set(self, key, value):
+        if key is None or value is None:
+            raise SplayTreeException('error')
+
+        block_idx, idx = self.locate(key)
+        if idx < 0:
+            raise SplayTreeException('error')
+
+        self.value_blocks[block_idx][idx] = value
+
+    def maximum(self):
+        if not self.maxes:
+            raise SplayTreeException('error')
+
+        return self.key_blocks[-1][-1], self.value_blocks[-1][-1]
+
+    def minimum(self):
+        if not self.maxes:
+            raise SplayTreeException('error')
+
+        return self.key_blocks[0][0], self.value_blocks[0][0]
+
+
+# Блокировка читатели-писатель: читатели проходят вместе, писатель ждёт их выхода и получает
+# приоритет, чтобы поток чтений не задерживал запись бесконечно.
+class ReadWriteLock:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.readers = 0
+        self.writer = False
+        self.writers_waiting = 0
+
+    @contextmanager
+    def read_lock(self):
+        with self.condition:
+            while self.writer or self.writers_waiting:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        with self.condition:
+            self.writers_waiting += 1
+            while self.writer or self.readers:
+                self.condition.wait()
+            self.writers_waiting -= 1
+            self.writer = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writer = False
+                self.condition.notify_all()
+
+
+# Потокобезопасная обёртка над SplayTree. Изменения идут под блокировкой записи.
+# При splay_on_read=True чтения поднимают узел в корень и тоже берут блокировку записи;
+# при False они спускаются по дереву без поворотов и выполняются параллельно под блокировкой чтения.
+class ConcurrentSplayTree(OrderedMap):
+    def __init__(self, tree=None, splay_on_read=True):
+        self.tree = tree if tree is not None else SplayTree()
+        self.splay_on_read = splay_on_read
+        self.lock = ReadWriteLock()
+
+    def add(self, key=None, value=None):
+        with self.lock.write_lock():
+            self.tree.add(key, value)
+
+    def set(self, key, value):
+        with self.lock.write_lock():
+            self.tree.set(key, value)
+
+    def delete(self, key):
+        with self.lock.write_lock():
+            self.tree.delete(key)
+
+    def search(self, key):
+        if self.splay_on_read:
+            with self.lock.write_lock():
+                return self.tree.search(key)
+
+        if key is None:
+            raise SplayTreeException('error')
+
+        with self.lock.read_lock():
+            node = SplayTree.find(self.tree.root, key)
+            return node.value if node is not None and node.key == key else None
+
+    def minimum(self):
+        if self.splay_on_read:
+            with self.lock.write_lock():
+                return self.tree.minimum()
+
+        with self.lock.read_lock():
+            node = self.tree.root
+            if node is None:
+                raise SplayTreeException('error')
+            while node.has_left_child():
+                node = node.l_child
+            return node.key, node.value
+
+    def maximum(self):
+        if self.splay_on_read:
+            with self.lock.write_lock():
+                return self.tree.maximum()
+
+        with self.lock.read_lock():
+            node = self.tree.root
+            if node is None:
+                raise SplayTreeException('error')
+            while node.has_right_child():
+                node = node.r_child
+            return node.key, node.value
+
+    # Согласованный срез [lo, hi] (None - без границы): пары копируются под блокировкой чтения,
+    # и итерация по ним не мешает последующим изменениям дерева.
+    def snapshot(self, lo=None, hi=None):
+        with self.lock.read_lock():
+            items = list(self.tree.walk(lo, hi))
+
+        return iter(items)
+
+
+# SplayTree, переживающее перезапуск (см. wal.DurableState): журнал tree.wal и снимок tree.snapshot
+# с парами по возрастанию ключей, который восстанавливается через SplayTree.from_sorted.
+# split и join не поддерживаются: их результат - второе дерево, которого журнал не видит.
+class DurableSplayTree(DurableState, OrderedMap):
+    NAME = 'tree'
+    WAL_MAGIC = b'TREEWAL1'
+    SNAPSHOT_MAGIC = b'TREESNP1'
+    error = SplayTreeException
+
+    def load(self, items):
+        self.tree = SplayTree.from_sorted(items)
+
+    def items(self):
+        return self.tree.walk()
+
+    def apply(self, op, key, value):
+        if op == OP_ADD:
+            self.tree.add(key, value)
+        elif op == OP_SET:
+            self.tree.set(key, value)
+        elif op == OP_DELETE:
+            self.tree.delete(key)
+        else:
+            self.tree.bulk_delete(key, int(value))
+
+    def add(self, key=None, value=None):
+        record = self.record(OP_ADD, key, value)
+        self.tree.add(key, value)
+        self.logged(record)
+
+    def set(self, key, value):
+        record = self.record(OP_SET, key, value)
+        self.tree.set(key, value)
+        self.logged(record)
+
+    def delete(self, key):
+        record = self.record(OP_DELETE, key)
+        self.tree.delete(key)
+        self.logged(record)
+
+    # Верхняя граница диапазона хранится в поле значения записи.
+    def bulk_delete(self, lo, hi):
+        if hi is None:
+            raise SplayTreeException('error')
+
+        record = self.record(OP_BULK_DELETE, lo, str(hi))
+        removed = self.tree.bulk_delete(lo, hi)
+        if removed:
+            self.logged(record)
+        return removed
+
+    def search(self, key):
+        return self.tree.search(key)
+
+    def minimum(self):
+        return self.tree.minimum()
+
+    def maximum(self):
+        return self.tree.maximum()
+
+    def size(self):
+        return self.tree.size()
+
+    def rank(self, key):
+        return self.tree.rank(key)
+
+    def select(self, k):
+        return self.tree.select(k)
+
+    def count(self, lo, hi):
+        return self.tree.count(lo, hi)
+
+    def range(self, lo, hi):
+        return self.tree.range(lo, hi)
+
+    def walk(self, lo=None, hi=None):
+        return self.tree.walk(lo, hi)
+
+    def print(self, out=sys.stdout):
+        self.tree.print(out)
+
+    def dump(self, out=sys.stdout):
+        self.tree.dump(out)
+
+
+ENGINES = {
+    'splay': SplayTree,
+    'btree': BTreeMap,
+    'blocked': BlockedSortedList,
+}
+
+
+# Трасса операций над n ключами: сначала вставка всех ключей, затем n * 4 обращений
+# (80% search, 10% set, 10% delete с повторным add). При skewed ключи обращений распределены
+# по закону Парето, так что несколько горячих ключей получают большую часть запросов.
+def make_trace(n, skewed, seed=0):
+    rnd = random.Random(seed)
+    keys = rnd.sample(range(n * 10), n)
+    trace = [('add', key) for key in keys]
+
+    for _ in range(n * 4):
+        if skewed:
+            key = keys[min(int(rnd.paretovariate(1.2)) - 1, n - 1)]
+        else:
+            key = keys[rnd.randrange(n)]
+
+        roll = rnd.random()
+        if roll < 0.8:
+            trace.append(('search', key))
+        elif roll < 0.9:
+            trace.append(('set', key))
+        else:
+            trace.append(('delete', key))
+            trace.append(('add', key))
+
+    return trace
+
+
+def replay(engine, trace):
+    ordered_map = ENGINES[engine]()
+    add, set_value, delete, search = ordered_map.add, ordered_map.set, ordered_map.delete, ordered_map.search
+
+    start = time.perf_counter()
+    for op, key in trace:
+        if op == 'search':
+            search(key)
+        elif op == 'set':
+            set_value(key, 'w')
+        elif op == 'add':
+            add(key, 'v')
+        else:
+            delete(key)
+
+    return time.perf_counter() - start
+
+
+def bench(n, out=sys.stdout):
+    for skewed in (False, True):
+        trace = make_trace(n, skewed)
+        for engine in ENGINES:
+            out.write(f'{"skewed" if skewed else "uniform"} {engine} {replay(engine, trace):.3f}\n')
+
+
+# n ключей, threads потоков делят между собой n * 4 операций: 95% search, 5% set.
+def bench_threads(n, out=sys.stdout):
+    keys = random.Random(0).sample(range(n * 10), n)
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    out.write(f'GIL {"enabled" if gil else "disabled"}\n')
+
+    for splay_on_read in (True, False):
+        for threads in (1, 2, 4, 8):
+            tree = ConcurrentSplayTree(SplayTree.from_sorted((key, 'v') for key in sorted(keys)), splay_on_read)
+            ops = n * 4 // threads
+
+            def worker(seed):
+                rnd = random.Random(seed)
+                for _ in range(ops):
+                    key = keys[rnd.randrange(n)]
+                    if rnd.random() < 0.95:
+                        tree.search(key)
+                    else:
+                        tree.set(key, 'w')
+
+            workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+            start = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            mode = 'splay' if splay_on_read else 'no-splay'
+            out.write(f'{mode} threads={threads} {elapsed:.3f}s {ops * threads / elapsed:.0f} ops/s\n')
+
+
+if __name__ == '__main__':
+    # "splay_tree.py [splay|btree|blocked]" - выбор движка (по умолчанию splay);
+    # "splay_tree.py bench [N]" - прогон трасс по всем движкам;
+    # "splay_tree.py bench-threads [N]" - ConcurrentSplayTree на 1-8 потоках.
+    usage = 'usage: splay_tree.py [splay | btree | blocked | bench N | bench-threads N | wal DIR]'
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'splay'
+    mode_arg = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if len(sys.argv) > 3:
+        sys.exit(usage)
+
+    if mode in ('bench', 'bench-threads'):
+        if mode_arg is not None and not mode_arg.isdecimal():
+            sys.exit(usage)
+        size = int(mode_arg) if mode_arg is not None else 100000
+        if mode == 'bench':
+            bench(size)
+        else:
+            bench_threads(size)
+        sys.exit()
+
+    # "splay_tree.py wal DIR" - SplayTree, восстановленное из DIR; изменения журналируются туда.
+    if mode == 'wal':
+        if mode_arg is None:
+            sys.exit(usage)
+        splay_tree = DurableSplayTree(mode_arg)
+    elif mode in ENGINES and mode_arg is None:
+        splay_tree = ENGINES[mode]()
+    else:
+        sys.exit(usage)
+    # rank/select/count/range/print/dump есть только у SplayTree; для других движков это 'error'.
+    extended = isinstance(splay_tree, (SplayTree, DurableSplayTree))
+
+    try:
+        for line in sys.stdin:
+            if line == '\n':
+                continue
+            try:
+                line = line[:-1]
+                cmd = line.split(' ')
+
+                if re.match(re.compile(r'(add -?\d+ \S*$)'), line):
+                    splay_tree.add(int(cmd[1]), cmd[2])
+
+                elif re.match(re.compile(r'(set -?\d+ \S*$)'), line):
+                    splay_tree.set(int(cmd[1]), cmd[2])
+
+                elif re.match(re.compile(r'(delete -?\d+$)'), line):
+                    splay_tree.delete(int(cmd[1]))
+
+                elif re.match(re.compile(r'(search -?\d+$)'), line):
+                    value = splay_tree.search(int(cmd[1]))
+                    if value is not None:
+                        print(f'1 {value}')
+                    else:
+                        print('0')
+
+                elif re.match(re.compile(r'(min)$'), line):
+                    key, value = splay_tree.minimum()
+                    print(f'{key} {value}')
+
+                elif re.match(re.compile(r'(max)$'), line):
+                    key, value = splay_tree.maximum()
+                    print(f'{key} {value}')
+
+                elif extended and re.match(re.compile(r'(rank -?\d+$)'), line):
+                    print(splay_tree.rank(int(cmd[1])))
+
+                elif extended and re.match(re.compile(r'(select \d+$)'), line):
+                    key, value = splay_tree.select(int(cmd[1]))
+                    print(f'{key} {value}')
+
+                elif extended and re.match(re.compile(r'(count -?\d+ -?\d+$)'), line):
+                    print(splay_tree.count(int(cmd[1]), int(cmd[2])))
+
+                elif extended and re.match(re.compile(r'(range -?\d+ -?\d+$)'), line):
+                    for key, value in splay_tree.range(int(cmd[1]), int(cmd[2])):
+                        print(f'{key} {value}')
+
+                elif extended and re.match(re.compile(r'(print)$'), line):
+                    splay_tree.print()
+
+                elif extended and re.match(re.compile(r'(dump)$'), line):
+                    splay_tree.dump()
+                else:
+                    print("error")
+            except SplayTreeException as st_error:
+                print(st_error)
+    finally:
+        if isinstance(splay_tree, DurableSplayTree):
+            splay_tree.close()
@@ -0,0 +1,223 @@
+import mmap
+import os
+import struct
+import zlib
+from abc import ABC, abstractmethod
+
+LOG_HEADER = struct.Struct('<8sQ')
+RECORD = struct.Struct('<IBqI')
+SNAPSHOT_HEADER = struct.Struct('<8sQQ')
+SNAPSHOT_ITEM = struct.Struct('<qI')
+OP_ADD, OP_SET, OP_DELETE, OP_BULK_DELETE = 1, 2, 3, 4
+
+
+# Журнал изменений (WAL): заголовок LOG_HEADER (магия, поколение), затем записи
+# RECORD (crc32, операция, ключ int64, длина значения) + значение в UTF-8. Записи копятся в pending
+# и сбрасываются одной записью с fsync (групповая фиксация). При чтении журнал открывается
+# через mmap; запись с неверной crc или обрезанная на конце файла считается концом журнала.
+class WriteAheadLog:
+    def __init__(self, path, magic, group_size=64):
+        self.path = path
+        self.magic = magic
+        self.group_size = group_size
+        self.pending = []
+        self.file = None
+
+    # Атомарно заменяет журнал пустым журналом нового поколения.
+    def reset(self, generation):
+        self.close()
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as tmp:
+            tmp.write(LOG_HEADER.pack(self.magic, generation))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.path)
+
+        self.file = open(self.path, 'ab')
+
+    # Возвращает (поколение, записи, конец последней целой записи);
+    # поколение None, если журнала нет или он повреждён.
+    def read(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < LOG_HEADER.size:
+            return None, [], 0
+
+        records = []
+
+        with open(self.path, 'rb') as log, mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, generation = LOG_HEADER.unpack_from(data, 0)
+            if magic != self.magic:
+                return None, [], 0
+
+            pos = LOG_HEADER.size
+            while pos + RECORD.size <= len(data):
+                crc, op, key, length = RECORD.unpack_from(data, pos)
+                end = pos + RECORD.size + length
+                if end > len(data) or zlib.crc32(data[pos + 4:end]) != crc:
+                    break
+                records.append((op, key, data[pos + RECORD.size:end].decode()))
+                pos = end
+
+        return generation, records, pos
+
+    # Продолжает запись в существующий журнал, отрезав недописанный хвост.
+    def attach(self, end):
+        self.close()
+        self.file = open(self.path, 'r+b')
+        self.file.truncate(end)
+        self.file.seek(end)
+
+    # Готовая к записи запись; ValueError, если ключ не помещается в int64 или значения нет.
+    @staticmethod
+    def encode(op, key, value=''):
+        if value is None:
+            raise ValueError('value is required')
+
+        payload = value.encode()
+        try:
+            body = RECORD.pack(0, op, key, len(payload))[4:] + payload
+        except struct.error as error:
+            raise ValueError(str(error)) from None
+
+        return struct.pack('<I', zlib.crc32(body)) + body
+
+    def append(self, record):
+        self.pending.append(record)
+
+        if len(self.pending) >= self.group_size:
+            self.commit()
+
+    def commit(self):
+        if not self.pending:
+            return
+
+        self.file.write(b''.join(self.pending))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = []
+
+    def close(self):
+        if self.file is not None:
+            self.commit()
+            self.file.close()
+            self.file = None
+
+
+def new_generation():
+    return int.from_bytes(os.urandom(8), 'little')
+
+
+# Общая часть структур, переживающих перезапуск. В каталоге directory лежат журнал NAME.wal
+# и снимок NAME.snapshot: заголовок SNAPSHOT_HEADER (магия, поколение журнала, число пар),
+# затем пары (ключ, значение) в порядке items(). Восстановление читает снимок через mmap,
+# передаёт пары в load и применяет только журнал того же поколения; после снимка журнал
+# начинается заново, так что время восстановления зависит от длины хвоста.
+# Изменение сначала кодируется в запись (record), затем применяется к структуре и только
+# после этого попадает в журнал (logged).
+class DurableState(ABC):
+    NAME = None
+    WAL_MAGIC = None
+    SNAPSHOT_MAGIC = None
+    error = ValueError
+
+    def __init__(self, directory, group_size=64, snapshot_every=1 << 20):
+        os.makedirs(directory, exist_ok=True)
+
+        self.snapshot_path = os.path.join(directory, f'{self.NAME}.snapshot')
+        self.snapshot_every = snapshot_every
+        self.log = WriteAheadLog(os.path.join(directory, f'{self.NAME}.wal'), self.WAL_MAGIC, group_size)
+        self.since_snapshot = 0
+
+        generation, items = self.load_snapshot()
+        self.load(items)
+
+        log_generation, records, end = self.log.read()
+
+        if generation is None and log_generation is not None:
+            generation = log_generation
+
+        if log_generation is None or log_generation != generation:
+            # Журнала нет, или он целиком покрыт снимком (сбой между снимком и сменой журнала).
+            self.log.reset(generation if generation is not None else new_generation())
+        else:
+            for op, key, value in records:
+                self.apply(op, key, value)
+            self.since_snapshot = len(records)
+            self.log.attach(end)
+
+    # Заполняет структуру парами из снимка.
+    @abstractmethod
+    def load(self, items):
+        raise NotImplementedError
+
+    # Пары (ключ, значение) для снимка.
+    @abstractmethod
+    def items(self):
+        raise NotImplementedError
+
+    # Повторяет записанное изменение при восстановлении.
+    @abstractmethod
+    def apply(self, op, key, value):
+        raise NotImplementedError
+
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None, []
+
+        items = []
+
+        with open(self.snapshot_path, 'rb') as snapshot, \
+                mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, generation, count = SNAPSHOT_HEADER.unpack_from(data, 0)
+            if magic != self.SNAPSHOT_MAGIC:
+                raise self.error('error')
+
+            pos = SNAPSHOT_HEADER.size
+            for _ in range(count):
+                key, length = SNAPSHOT_ITEM.unpack_from(data, pos)
+                pos += SNAPSHOT_ITEM.size
+                items.append((key, data[pos:pos + length].decode()))
+                pos += length
+
+        return generation, items
+
+    # Фиксирует журнал и пишет снимок в новый файл; затем журнал начинается с нового поколения.
+    def snapshot(self):
+        self.log.commit()
+        generation = new_generation()
+
+        parts = []
+        for key, value in self.items():
+            value = value.encode()
+            parts.append(SNAPSHOT_ITEM.pack(key, len(value)))
+            parts.append(value)
+
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as snapshot:
+            snapshot.write(SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, generation, len(parts) // 2))
+            snapshot.write(b''.join(parts))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        self.log.reset(generation)
+        self.since_snapshot = 0
+
+    def record(self, op, key, value=''):
+        try:
+            return WriteAheadLog.encode(op, key, value)
+        except ValueError:
+            raise self.error('error') from None
+
+    def logged(self, record):
+        self.log.append(record)
+        self.since_snapshot += 1
+
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def commit(self):
+        self.log.commit()
+
+    def close(self):
+        self.log.close()